@@ -0,0 +1,32 @@
+'''Reusable building blocks extracted from the CNN notebooks
+
+The builders are importable from the package root, but TensorFlow is only
+imported when one of them is first accessed, so `import cnns` and the CLI
+(`python -m cnns --help`) start instantly.
+'''
+
+import importlib
+
+_EXPORTS = {
+    'build_encoder': 'cnns.autoencoder',
+    'build_decoder': 'cnns.autoencoder',
+    'build_autoencoder': 'cnns.autoencoder',
+    'compile_autoencoder': 'cnns.autoencoder',
+    'initialize_model': 'cnns.cifar',
+    'compile_model': 'cnns.cifar',
+    'load_own_model': 'cnns.transfer',
+    'build_model': 'cnns.transfer',
+    'load_flowers_data': 'cnns.transfer',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module 'cnns' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,3 @@
+from cnns.cli import main
+
+main()
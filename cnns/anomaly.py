@@ -0,0 +1,134 @@
+'''Streaming anomaly scoring on the autoencoder reconstruction error
+
+Instead of one `autoencoder.predict` over the whole dataset followed by
+NumPy post-processing, `AnomalyScorer` scores images batch by batch: the
+per-image MSE is reduced inside the compiled graph (reconstructions never
+reach NumPy), the running percentiles come from a constant-memory
+`QuantileSketch` and the top-k worst images are updated incrementally.
+
+    scorer = AnomalyScorer(autoencoder, top_k=20)
+    for result in scorer.stream(batches):        # iterable of (n, 28, 28, 1) arrays
+        alert(result['anomalies'])               # ids above the running 99th percentile
+    scorer.thresholds(), scorer.top(), scorer.images_per_sec
+'''
+
+import math
+import time
+
+import numpy as np
+import tensorflow as tf
+
+
+class QuantileSketch:
+    '''Log-bucketed histogram of positive values (as in DDSketch)
+
+    Every quantile of the values in [`min_value`, `max_value`] is returned
+    within `relative_accuracy`; memory is a fixed number of counters
+    whatever the number of values. Values outside the range are clamped.
+    '''
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-8, max_value=1e4):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        self.counts = np.zeros(math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1, dtype='int64')
+
+    def __len__(self):
+        return int(self.counts.sum())
+
+    def update(self, values):
+        values = np.maximum(np.asarray(values, dtype='float64').reshape(-1), np.finfo('float64').tiny)
+        buckets = np.ceil(np.log(values) / self._log_gamma).astype('int64') - self._offset
+        self.counts += np.bincount(np.clip(buckets, 0, len(self.counts) - 1), minlength=len(self.counts))
+
+    def quantile(self, q):
+        '''Value below which a fraction `q` of the values fall (nan when empty)'''
+        total = self.counts.sum()
+        if total == 0:
+            return float('nan')
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * (total - 1), side='right'))
+        return 2 * self.gamma ** (bucket + self._offset) / (self.gamma + 1)
+
+
+class AnomalyScorer:
+    '''Per-image reconstruction MSE of `autoencoder`, scored and ranked in a stream
+
+    An image is an anomaly when its error exceeds the running
+    `threshold_percentile` of all the errors seen before its batch (once
+    `warmup` images have been seen).
+    '''
+
+    def __init__(self, autoencoder, percentiles=(50, 95, 99, 99.9), threshold_percentile=99, top_k=100,
+                 warmup=1000, sketch=None):
+        self.autoencoder = autoencoder
+        self.percentiles = percentiles
+        self.threshold_percentile = threshold_percentile
+        self.top_k = top_k
+        self.warmup = warmup
+        self.sketch = sketch or QuantileSketch()
+        self._top_ids = np.empty(0, dtype='int64')
+        self._top_scores = np.empty(0, dtype='float64')
+        self.num_images = 0
+        self.seconds = 0.
+
+        @tf.function(reduce_retracing=True)
+        def errors(X):
+            return tf.reduce_mean(tf.square(X - autoencoder(X, training=False)), axis=[1, 2, 3])
+        self._errors = errors
+
+    @property
+    def images_per_sec(self):
+        return self.num_images / self.seconds if self.seconds else float('nan')
+
+    def score(self, X):
+        '''Reconstruction MSE of each image of the batch `X`'''
+        return self._errors(tf.convert_to_tensor(np.asarray(X, dtype='float32'))).numpy()
+
+    def update(self, X, ids=None):
+        '''Score one batch; returns its scores, anomalies and the images that entered the top-k'''
+        start = time.perf_counter()
+        ids = np.arange(self.num_images, self.num_images + len(X)) if ids is None else np.asarray(ids)
+        scores = self.score(X)
+        threshold = (self.sketch.quantile(self.threshold_percentile / 100)
+                     if len(self.sketch) >= self.warmup else float('inf'))
+        self.sketch.update(scores)
+
+        candidate_ids = np.concatenate([self._top_ids, ids])
+        candidate_scores = np.concatenate([self._top_scores, scores])
+        if len(candidate_scores) > self.top_k:
+            keep = np.argpartition(-candidate_scores, self.top_k - 1)[:self.top_k]
+            candidate_ids, candidate_scores = candidate_ids[keep], candidate_scores[keep]
+        entered = np.isin(candidate_ids, ids)
+        self._top_ids, self._top_scores = candidate_ids, candidate_scores
+
+        self.num_images += len(X)
+        self.seconds += time.perf_counter() - start
+        anomalous = scores > threshold
+        return {
+            'ids': ids,
+            'scores': scores,
+            'threshold': threshold,
+            'anomalies': ids[anomalous],
+            'anomaly_scores': scores[anomalous],
+            'new_top': list(zip(candidate_ids[entered].tolist(), candidate_scores[entered].tolist())),
+        }
+
+    def stream(self, batches):
+        '''`update` every batch of `batches` (arrays, or (ids, array) pairs), yielding the results'''
+        for batch in batches:
+            yield self.update(batch[1], batch[0]) if isinstance(batch, tuple) else self.update(batch)
+
+    def thresholds(self):
+        '''Running percentiles of the errors seen so far'''
+        return {p: self.sketch.quantile(p / 100) for p in self.percentiles}
+
+    def top(self):
+        '''(id, score) of the `top_k` worst reconstructed images, worst first'''
+        order = np.argsort(-self._top_scores)
+        return list(zip(self._top_ids[order].tolist(), self._top_scores[order].tolist()))
+
+
+def batches(X, batch_size=256):
+    '''(ids, images) batches of an array or memory map, for `AnomalyScorer.stream`'''
+    for start in range(0, len(X), batch_size):
+        yield np.arange(start, min(start + batch_size, len(X))), X[start:start + batch_size]
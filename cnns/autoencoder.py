@@ -0,0 +1,58 @@
+'''MNIST data and models from the autoencoder notebook'''
+
+from tensorflow.keras import Model, Sequential
+from tensorflow.keras.layers import Conv2D, Conv2DTranspose, Dense, Flatten, Input, MaxPooling2D, Reshape
+
+from cnns.datasets import load_data
+
+
+def load_mnist(mirror=None):
+    '''MNIST images with a channel axis, normalised between 0 and 1'''
+    (images_train, _), (images_test, _) = load_data('mnist', mirror)
+    X_train = images_train.reshape((-1, 28, 28, 1)) / 255.
+    X_test = images_test.reshape((-1, 28, 28, 1)) / 255.
+    return X_train, X_test
+
+
+def build_encoder(latent_dimension):
+    '''returns an encoder model, of output_shape equals to latent_dimension'''
+    encoder = Sequential()
+
+    encoder.add(Conv2D(8, (2,2), input_shape=(28, 28, 1), activation='relu'))
+    encoder.add(MaxPooling2D(2))
+
+    encoder.add(Conv2D(16, (2, 2), activation='relu'))
+    encoder.add(MaxPooling2D(2))
+
+    encoder.add(Conv2D(32, (2, 2), activation='relu'))
+    encoder.add(MaxPooling2D(2))
+
+    encoder.add(Flatten())
+    encoder.add(Dense(latent_dimension, activation='tanh'))
+
+    return encoder
+
+
+def build_decoder(latent_dimension):
+
+    decoder = Sequential()
+
+    decoder.add(Dense(7*7*8, activation='tanh', input_shape=(latent_dimension,)))
+    decoder.add(Reshape((7, 7, 8)))  # no batch axis here
+    decoder.add(Conv2DTranspose(8, (2, 2), strides=2, padding='same', activation='relu'))
+
+    decoder.add(Conv2DTranspose(1, (2, 2), strides=2, padding='same', activation='relu'))
+    return decoder
+
+
+def build_autoencoder(encoder, decoder):
+    inp = Input((28, 28,1))
+    encoded = encoder(inp)
+    decoded = decoder(encoded)
+    autoencoder = Model(inp, decoded)
+    return autoencoder
+
+
+def compile_autoencoder(autoencoder):
+    autoencoder.compile(loss='mse',
+                  optimizer='adam')
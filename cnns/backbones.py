@@ -0,0 +1,83 @@
+'''Registry of pretrained convolutional bases usable by `build_model`
+
+Each entry binds the Keras application constructor to its own
+`preprocess_input`, so that the data is always prepared the way the
+backbone was trained on ImageNet.
+
+To work offline, put the Keras `notop` weight files in a directory and pass
+it as `weights_dir` (or set the `CNNS_WEIGHTS_DIR` environment variable),
+or pass the path of the file directly as `weights`.
+'''
+
+import os
+from collections import namedtuple
+
+from tensorflow.keras.applications import efficientnet, mobilenet_v2, resnet50, vgg16
+
+Backbone = namedtuple('Backbone', ['build', 'preprocess_input', 'weights_file', 'min_size', 'native_sizes'])
+
+BACKBONES = {
+    'vgg16': Backbone(vgg16.VGG16, vgg16.preprocess_input,
+                      'vgg16_weights_tf_dim_ordering_tf_kernels_notop.h5', 32, None),
+    'resnet50': Backbone(resnet50.ResNet50, resnet50.preprocess_input,
+                         'resnet50_weights_tf_dim_ordering_tf_kernels_notop.h5', 32, None),
+    'mobilenet_v2': Backbone(mobilenet_v2.MobileNetV2, mobilenet_v2.preprocess_input,
+                             'mobilenet_v2_weights_tf_dim_ordering_tf_kernels_1.0_{size}_no_top.h5', 32,
+                             (96, 128, 160, 192, 224)),
+    'efficientnet_b0': Backbone(efficientnet.EfficientNetB0, efficientnet.preprocess_input,
+                                'efficientnetb0_notop.h5', 32, None),
+}
+
+
+def get_backbone(name):
+    if name not in BACKBONES:
+        raise ValueError(f"Unknown backbone '{name}', choose among {sorted(BACKBONES)}")
+    return BACKBONES[name]
+
+
+def get_preprocess_input(name):
+    '''The `preprocess_input` matching the backbone `name`'''
+    return get_backbone(name).preprocess_input
+
+
+def check_input_shape(name, input_shape):
+    backbone = get_backbone(name)
+    height, width = input_shape[:2]
+    if min(height, width) < backbone.min_size:
+        raise ValueError(f"{name} needs inputs of at least {backbone.min_size}x{backbone.min_size}, "
+                         f"got {height}x{width}")
+    return backbone
+
+
+def weights_size(name, input_shape):
+    '''Resolution of the ImageNet weights to use for `input_shape`
+
+    MobileNetV2 only ships weights for a few square resolutions: pick the
+    closest one (the convolutions work at any size, only the statistics
+    the kernels were trained on differ). Other backbones have a single set.
+    '''
+    backbone = check_input_shape(name, input_shape)
+    if backbone.native_sizes is None:
+        return None
+    return min(backbone.native_sizes, key=lambda size: abs(size - min(input_shape[:2])))
+
+
+def resolve_weights(name, input_shape, weights='imagenet', weights_dir=None):
+    '''Turn `weights='imagenet'` into a local file path when one is available'''
+    if weights != 'imagenet':
+        return weights
+    weights_dir = weights_dir or os.environ.get('CNNS_WEIGHTS_DIR')
+    if weights_dir is None:
+        return weights
+    filename = get_backbone(name).weights_file.format(size=weights_size(name, input_shape))
+    path = os.path.join(weights_dir, filename)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No local weights for {name}: expected {path}")
+    return path
+
+
+def load_backbone(name='vgg16', input_shape=(256, 256, 3), weights='imagenet', weights_dir=None):
+    '''Pretrained backbone `name` without its fully-connected top'''
+    backbone = check_input_shape(name, input_shape)
+    weights = resolve_weights(name, input_shape, weights, weights_dir)
+    return backbone.build(weights=weights, include_top=False, input_shape=tuple(input_shape))
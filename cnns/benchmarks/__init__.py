@@ -0,0 +1,56 @@
+'''Benchmarks comparing the notebook models with their optimised variants
+
+Every module exposes a `run(...)` function returning a list of result rows
+(dicts) and a `main()` that prints them with `print_table`.
+'''
+
+import time
+
+from tensorflow.keras.callbacks import Callback, EarlyStopping
+
+
+class StepTimer(Callback):
+    '''Record the wall time of every training batch'''
+
+    def __init__(self):
+        super().__init__()
+        self.step_times = []
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step_times.append(time.perf_counter() - self._start)
+
+    def median_step_time(self, skip=1):
+        '''Median step time, skipping the first `skip` (tracing) steps'''
+        times = sorted(self.step_times[skip:] or self.step_times)
+        return times[len(times) // 2] if times else float('nan')
+
+
+def train_or_load(model, X_train, y_train, X_val, y_val, weights=None, epochs=20, batch_size=32):
+    '''Load `weights` into `model`, or train it with early stopping when there are none'''
+    if weights:
+        model.load_weights(weights)
+        return model
+    model.fit(X_train, y_train,
+              validation_data=(X_val, y_val),
+              epochs=epochs,
+              batch_size=batch_size,
+              callbacks=[EarlyStopping(monitor='val_accuracy', mode='max', patience=3,
+                                       restore_best_weights=True)],
+              verbose=0)
+    return model
+
+
+def print_table(rows):
+    '''Print a list of dicts as an aligned text table'''
+    if not rows:
+        return
+    columns = list(rows[0])
+    cells = [[f'{row[c]:.4g}' if isinstance(row[c], float) else str(row[c]) for c in columns]
+             for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print('  '.join(v.ljust(w) for v, w in zip(r, widths)))
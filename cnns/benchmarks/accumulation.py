@@ -0,0 +1,57 @@
+'''Step time of the gradient-accumulation loop against the default `fit`
+
+    python -m cnns.benchmarks.accumulation [flowers_dir] [accumulation_steps]
+
+Both flowers models train with micro-batches of 16; `fit_accumulated`
+applies one update per `accumulation_steps` micro-batches. Throughput is
+compared in images per second, as the steps are not the same size.
+'''
+
+import sys
+
+import numpy as np
+
+from cnns.backbones import get_preprocess_input
+from cnns.benchmarks import StepTimer, print_table
+from cnns.training import fit_accumulated
+from cnns.transfer import build_model, load_flowers_data, load_flowers_mirror, load_own_model
+
+
+def run(name, build_fn, X_train, y_train, accumulation_steps=4, batch_size=16, epochs=2):
+    rows = []
+    for mode in ('fit', 'accumulated'):
+        model = build_fn()
+        timer = StepTimer()
+        if mode == 'fit':
+            model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, callbacks=[timer], verbose=0)
+            images_per_step = batch_size
+        else:
+            fit_accumulated(model, X_train, y_train, epochs=epochs, batch_size=batch_size,
+                            accumulation_steps=accumulation_steps, callbacks=[timer], verbose=0)
+            images_per_step = batch_size * accumulation_steps
+        step_time = timer.median_step_time(skip=2)
+        rows.append({
+            'model': name,
+            'mode': mode,
+            'effective_batch': images_per_step,
+            'step_ms': step_time * 1000,
+            'images_per_sec': images_per_step / step_time,
+        })
+    return rows
+
+
+def main(data_path=None, accumulation_steps=4):
+    accumulation_steps = int(accumulation_steps)
+    data = load_flowers_data(data_path) if data_path else load_flowers_mirror()
+    X_train, y_train, _, _, _, _, num_classes = data
+    input_shape = X_train.shape[1:]
+    rows = run('homemade', lambda: load_own_model(input_shape, num_classes),
+               X_train, y_train, accumulation_steps)
+    X_vgg = get_preprocess_input('vgg16')(np.array(X_train, dtype='float32'))
+    rows += run('vgg16', lambda: build_model(input_shape=input_shape, num_classes=num_classes),
+                X_vgg, y_train, accumulation_steps)
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,50 @@
+'''Throughput and accuracy of the streaming anomaly scorer on MNIST
+
+    python -m cnns.benchmarks.anomaly [autoencoder_weights.h5] [latent_dimension]
+
+Compares the streaming scorer with the full `predict` + NumPy path, and
+the sketch percentiles with the exact ones.
+'''
+
+import sys
+import time
+
+import numpy as np
+
+from cnns.anomaly import AnomalyScorer, batches
+from cnns.autoencoder import build_autoencoder, build_decoder, build_encoder, load_mnist
+from cnns.benchmarks import print_table
+
+
+def run(autoencoder, X, batch_size=256, top_k=100):
+    start = time.perf_counter()
+    errors = np.mean((autoencoder.predict(X, batch_size=batch_size, verbose=0) - X) ** 2, axis=(1, 2, 3))
+    exact_seconds = time.perf_counter() - start
+    exact_top = set(np.argsort(-errors)[:top_k].tolist())
+
+    scorer = AnomalyScorer(autoencoder, top_k=top_k)
+    for _ in scorer.stream(batches(X, batch_size)):
+        pass
+    rows = [{'method': 'predict+numpy', 'images_per_sec': len(X) / exact_seconds, 'top_k_recall': 1.},
+            {'method': 'streaming', 'images_per_sec': scorer.images_per_sec,
+             'top_k_recall': len(exact_top & {i for i, _ in scorer.top()}) / top_k}]
+    for p, value in scorer.thresholds().items():
+        exact = float(np.percentile(errors, p))
+        rows.append({'method': f'p{p}', 'sketch': value, 'exact': exact,
+                     'relative_error': abs(value - exact) / exact})
+    return rows
+
+
+def main(weights=None, latent_dimension=2):
+    latent_dimension = int(latent_dimension)
+    _, X_test = load_mnist()
+    autoencoder = build_autoencoder(build_encoder(latent_dimension), build_decoder(latent_dimension))
+    if weights:
+        autoencoder.load_weights(weights)
+    rows = run(autoencoder, X_test)
+    print_table([row for row in rows if 'images_per_sec' in row])
+    print_table([row for row in rows if 'sketch' in row])
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,56 @@
+'''Compare the backbones of `build_model` on the flowers data
+
+    python -m cnns.benchmarks.backbones flowers/ [weights_dir]
+
+Reports the CPU inference latency for a single image and per image in a
+batch of 32, next to the test accuracy of a short head training.
+'''
+
+import sys
+
+import numpy as np
+
+from cnns.backbones import BACKBONES, get_preprocess_input
+from cnns.benchmarks import StepTimer, print_table
+from cnns.timing import time_call
+from cnns.transfer import build_model, load_flowers_data
+
+
+def run(X_train, y_train, X_val, y_val, X_test, y_test, backbones=tuple(BACKBONES),
+        head='avg', epochs=5, batch_size=16, weights_dir=None):
+    '''Train the same head on each backbone; inputs are the raw uint8 images'''
+    rows = []
+    for backbone in backbones:
+        preprocess_input = get_preprocess_input(backbone)
+        # preprocess_input works in place on float arrays: give it copies
+        X_tr, X_v, X_te = (preprocess_input(np.array(X, dtype='float32')) for X in (X_train, X_val, X_test))
+
+        model = build_model(head, input_shape=X_train.shape[1:], num_classes=y_train.shape[1],
+                            backbone=backbone, weights_dir=weights_dir)
+        timer = StepTimer()
+        model.fit(X_tr, y_train,
+                  validation_data=(X_v, y_val),
+                  epochs=epochs,
+                  batch_size=batch_size,
+                  callbacks=[timer],
+                  verbose=0)
+
+        single, batch = X_te[:1], X_te[:32]
+        rows.append({
+            'backbone': backbone,
+            'params': model.count_params(),
+            'train_step_ms': timer.median_step_time() * 1000,
+            'latency_1_ms': time_call(lambda: model(single, training=False)) * 1000,
+            'latency_32_ms_per_img': time_call(lambda: model(batch, training=False)) * 1000 / len(batch),
+            'test_accuracy': model.evaluate(X_te, y_test, verbose=0)[-1],
+        })
+    return rows
+
+
+def main(data_path='flowers/', weights_dir=None):
+    X_train, y_train, X_val, y_val, X_test, y_test, _ = load_flowers_data(data_path)
+    print_table(run(X_train, y_train, X_val, y_val, X_test, y_test, weights_dir=weights_dir))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,52 @@
+'''Throughput cost of the deterministic mode
+
+    python -m cnns.benchmarks.determinism [num_images]
+
+Trains the same seeded model twice with and twice without deterministic
+ops, and reports the median step time and whether the two runs of each
+mode ended with identical weights.
+'''
+
+import sys
+
+import numpy as np
+
+from cnns.benchmarks import StepTimer, print_table
+from cnns.reproducibility import set_seed
+from cnns.transfer import load_own_model
+
+
+def _train(build_fn, X, y, seed, deterministic, epochs, batch_size):
+    set_seed(seed, deterministic)
+    model = build_fn()
+    timer = StepTimer()
+    model.fit(X, y, epochs=epochs, batch_size=batch_size, shuffle=True, callbacks=[timer], verbose=0)
+    return timer.median_step_time(), model.get_weights()
+
+
+def run(build_fn, X, y, seed=42, epochs=2, batch_size=16):
+    rows = []
+    # Non-deterministic first: op determinism cannot be disabled once enabled
+    for deterministic in (False, True):
+        step_time, weights = _train(build_fn, X, y, seed, deterministic, epochs, batch_size)
+        _, weights_again = _train(build_fn, X, y, seed, deterministic, epochs, batch_size)
+        rows.append({
+            'deterministic': deterministic,
+            'step_ms': step_time * 1000,
+            'identical_reruns': all(np.array_equal(a, b) for a, b in zip(weights, weights_again)),
+        })
+    rows[1]['slowdown'] = rows[1]['step_ms'] / rows[0]['step_ms']
+    rows[0]['slowdown'] = 1.
+    return rows
+
+
+def main(num_images=256):
+    num_images = int(num_images)
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 256, (num_images, 256, 256, 3)).astype('float32')
+    y = np.eye(3)[rng.integers(0, 3, num_images)]
+    print_table(run(load_own_model, X, y))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,62 @@
+'''Distil the VGG16 flowers model into `load_own_model`
+
+    python -m cnns.benchmarks.distillation vgg16_weights.h5 [cache_dir [seed]]
+
+Trains a student with and without the teacher targets and reports the
+accuracy and latency of teacher, distilled student and plain student.
+'''
+
+import os
+import sys
+
+from tensorflow.keras.callbacks import EarlyStopping
+
+from cnns.benchmarks import print_table
+from cnns.distillation import compare, compile_student, distillation_targets, teacher_logits
+from cnns.reproducibility import set_seed
+from cnns.transfer import build_model, load_flowers_mirror, load_own_model
+
+
+def run(teacher, X_train, y_train, X_val, y_val, X_test, y_test, temperature=4., alpha=0.3,
+        epochs=50, batch_size=16, cache_dir=None):
+    cache = (lambda name: os.path.join(cache_dir, f'teacher_{name}.npy')) if cache_dir else (lambda name: None)
+    train_targets = distillation_targets(y_train, teacher_logits(teacher, X_train, cache_path=cache('train')))
+    val_targets = distillation_targets(y_val, teacher_logits(teacher, X_val, cache_path=cache('val')))
+
+    num_classes = y_train.shape[1]
+    distilled = compile_student(load_own_model(X_train.shape[1:], num_classes), num_classes, temperature, alpha)
+    distilled.fit(X_train, train_targets,
+                  validation_data=(X_val, val_targets),
+                  epochs=epochs,
+                  batch_size=batch_size,
+                  callbacks=[EarlyStopping(monitor='val_accuracy', mode='max', patience=5,
+                                           restore_best_weights=True)],
+                  verbose=0)
+
+    plain = load_own_model(X_train.shape[1:], num_classes)
+    plain.fit(X_train, y_train,
+              validation_data=(X_val, y_val),
+              epochs=epochs,
+              batch_size=batch_size,
+              callbacks=[EarlyStopping(monitor='val_accuracy', mode='max', patience=5,
+                                       restore_best_weights=True)],
+              verbose=0)
+
+    rows = compare(teacher, distilled, X_test, y_test)
+    rows[1]['model'] = 'distilled_student'
+    plain_row = compare(teacher, plain, X_test, y_test)[1]
+    plain_row['model'] = 'plain_student'
+    return rows + [plain_row]
+
+
+def main(teacher_weights, cache_dir=None, seed=0):
+    # Same random split on every run, so that the cached teacher logits are reused
+    set_seed(int(seed), deterministic=False)
+    X_train, y_train, X_val, y_val, X_test, y_test, num_classes = load_flowers_mirror()
+    teacher = build_model(input_shape=X_train.shape[1:], num_classes=num_classes)
+    teacher.load_weights(teacher_weights)
+    print_table(run(teacher, X_train, y_train, X_val, y_val, X_test, y_test, cache_dir=cache_dir))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
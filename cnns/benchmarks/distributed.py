@@ -0,0 +1,39 @@
+'''Scaling efficiency of the data-parallel CIFAR training
+
+    python -m cnns.benchmarks.distributed [max_workers] [reduction_factor]
+
+Runs 1, 2, 4... local workers sharing the CPU cores equally. Efficiency is
+the throughput with k workers over k times the single-worker throughput;
+on one host it measures the all-reduce and input overhead, not the gain of
+adding machines.
+'''
+
+import sys
+
+from cnns.benchmarks import print_table
+from cnns.distributed import train_multi_worker
+
+
+def run(worker_counts=(1, 2, 4), epochs=3, batch_size=32, reduction_factor=5):
+    rows = []
+    for num_workers in worker_counts:
+        result = train_multi_worker(num_workers, epochs, batch_size, reduction_factor)
+        rows.append({
+            'workers': num_workers,
+            'global_batch': result['global_batch_size'],
+            'images_per_sec': result['images_per_sec'],
+            'final_accuracy': result['history']['accuracy'][-1],
+        })
+    baseline = rows[0]['images_per_sec'] / rows[0]['workers']
+    for row in rows:
+        row['efficiency'] = row['images_per_sec'] / (row['workers'] * baseline)
+    return rows
+
+
+def main(max_workers=4, reduction_factor=5):
+    worker_counts = [k for k in (1, 2, 4, 8, 16) if k <= int(max_workers)]
+    print_table(run(worker_counts, reduction_factor=int(reduction_factor)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
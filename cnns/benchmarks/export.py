@@ -0,0 +1,89 @@
+'''Parity and CPU latency of the exported flowers models
+
+    python -m cnns.benchmarks.export flowers/ [vgg_weights.h5] [own_weights.h5] [num_calibration]
+
+Without weight files the models are freshly initialised, which is enough
+to measure latency and check parity but not to read accuracies. The run
+fails when an artifact does not match the Keras outputs (`parity_ok`).
+'''
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from cnns.backbones import get_preprocess_input
+from cnns.benchmarks import print_table
+from cnns.export import (TFLiteModel, check_parity, export_saved_model, export_tflite, load_saved_model,
+                         with_preprocessing)
+from cnns.optimize import fold_rescaling
+from cnns.timing import time_call
+from cnns.transfer import build_model, load_flowers_data, load_own_model
+
+
+def run(name, model, X, y, X_calibration, backbone=None, batch_size=32, export_dir=None):
+    '''Export `model` every way and compare each artifact with Keras
+
+    `X` are raw pixels. The int8 model is calibrated on `X_calibration`,
+    raw pixels taken apart from the evaluated `X` (training images). For
+    transfer models `backbone` names the `preprocess_input` the Keras
+    reference applies outside the graph.
+    '''
+    export_dir = export_dir or tempfile.mkdtemp()
+    if backbone is None:
+        reference = lambda X: model.predict(X, verbose=0)
+        served = fold_rescaling(model)
+    else:
+        preprocess_input = get_preprocess_input(backbone)
+        reference = lambda X: model.predict(preprocess_input(np.array(X, dtype='float32')), verbose=0)
+        served = with_preprocessing(model, backbone)
+
+    saved_model_path = export_saved_model(served, os.path.join(export_dir, f'{name}_saved_model'))
+    float_path = export_tflite(served, os.path.join(export_dir, f'{name}.tflite'))
+    calibration = (X_calibration[i:i + batch_size] for i in range(0, len(X_calibration), batch_size))
+    int8_path = export_tflite(served, os.path.join(export_dir, f'{name}_int8.tflite'), calibration)
+
+    candidates = {
+        'keras': (reference, None),
+        'saved_model': (load_saved_model(saved_model_path), None),
+        'tflite': (TFLiteModel(float_path).predict, float_path),
+        'tflite_int8': (TFLiteModel(int8_path).predict, int8_path),
+    }
+    batch = np.asarray(X[:batch_size], dtype='float32')
+    rows = []
+    for variant, (predict, path) in candidates.items():
+        parity = check_parity(reference, predict, batch, atol=1e-4 if variant != 'tflite_int8' else 5e-2)
+        rows.append({
+            'model': name,
+            'variant': variant,
+            'size_mb': os.path.getsize(path) / 2**20 if path else float('nan'),
+            'latency_ms_per_img': time_call(lambda: predict(batch), repeats=10) * 1000 / len(batch),
+            'max_abs_diff': parity['max_abs_diff'],
+            'top1_agreement': parity['top1_agreement'],
+            'parity_ok': parity['ok'],
+            'accuracy': float(np.mean(predict(np.asarray(X, dtype='float32')).argmax(-1) == y.argmax(-1))),
+        })
+    return rows
+
+
+def main(data_path='flowers/', vgg_weights=None, own_weights=None, num_calibration=200):
+    X_train, _, _, _, X_test, y_test, num_classes = load_flowers_data(data_path)
+    # The training split is already shuffled: its first images are a random calibration set
+    X_calibration = X_train[:int(num_calibration)]
+    vgg = build_model(input_shape=X_test.shape[1:], num_classes=num_classes,
+                      weights=None if vgg_weights else 'imagenet')
+    own = load_own_model(X_test.shape[1:], num_classes)
+    for model, weights in ((vgg, vgg_weights), (own, own_weights)):
+        if weights:
+            model.load_weights(weights)
+    rows = (run('vgg16', vgg, X_test, y_test, X_calibration, backbone='vgg16')
+            + run('homemade', own, X_test, y_test, X_calibration))
+    print_table(rows)
+    failed = [f"{row['model']}/{row['variant']}" for row in rows if not row['parity_ok']]
+    if failed:
+        raise SystemExit(f"Exports differing from Keras: {', '.join(failed)}")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,47 @@
+'''Compare the classification heads of `build_model` on the flowers data
+
+    python -m cnns.benchmarks.heads flowers/
+'''
+
+import sys
+
+from tensorflow.keras.applications.vgg16 import preprocess_input
+from tensorflow.keras.callbacks import EarlyStopping
+
+from cnns.benchmarks import StepTimer, print_table
+from cnns.heads import HEADS
+from cnns.transfer import build_model, load_flowers_data
+
+
+def run(X_train, y_train, X_val, y_val, X_test, y_test, heads=tuple(HEADS),
+        epochs=10, batch_size=16):
+    '''Train one VGG16 model per head and report size, speed and accuracy'''
+    rows = []
+    for head in heads:
+        model = build_model(head, input_shape=X_train.shape[1:], num_classes=y_train.shape[1])
+        timer = StepTimer()
+        es = EarlyStopping(monitor='val_accuracy', mode='max', patience=5,
+                           restore_best_weights=True)
+        model.fit(X_train, y_train,
+                  validation_data=(X_val, y_val),
+                  epochs=epochs,
+                  batch_size=batch_size,
+                  callbacks=[es, timer],
+                  verbose=0)
+        rows.append({
+            'head': head,
+            'trainable_params': sum(int(w.shape.num_elements()) for w in model.trainable_weights),
+            'step_ms': timer.median_step_time() * 1000,
+            'test_accuracy': model.evaluate(X_test, y_test, verbose=0)[-1],
+        })
+    return rows
+
+
+def main(data_path='flowers/'):
+    X_train, y_train, X_val, y_val, X_test, y_test, _ = load_flowers_data(data_path)
+    X_train, X_val, X_test = preprocess_input(X_train), preprocess_input(X_val), preprocess_input(X_test)
+    print_table(run(X_train, y_train, X_val, y_val, X_test, y_test))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
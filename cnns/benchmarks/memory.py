@@ -0,0 +1,69 @@
+'''Memory timeline of the flowers, CIFAR and autoencoder pipelines
+
+    python -m cnns.benchmarks.memory [output.json] [baseline.json] [flowers_dir]
+
+Runs the notebook pipelines stage by stage under a `MemoryProfiler`,
+prints the per-stage report and writes the timeline. With a baseline
+report, the stages whose peak grew are listed as regressions.
+'''
+
+import sys
+
+import numpy as np
+from tensorflow.keras.applications.vgg16 import preprocess_input
+from tensorflow.keras.utils import to_categorical
+
+from cnns.autoencoder import build_autoencoder, build_decoder, build_encoder, load_mnist
+from cnns.benchmarks import print_table
+from cnns.cifar import initialize_model, load_cifar
+from cnns.memory import MemoryProfiler, compare_reports, load_report
+from cnns.transfer import load_flowers_data, load_flowers_mirror
+
+
+def run(profiler, data_path=None):
+    with profiler.stage('flowers'):
+        with profiler.stage('load_flowers_data'):
+            X_train, y_train, _, _, X_test, _, _ = (load_flowers_data(data_path) if data_path
+                                                    else load_flowers_mirror())
+        with profiler.stage('shuffle'):
+            X_train = X_train[np.random.permutation(len(X_train))]
+        with profiler.stage('preprocess_input'):
+            X_train = preprocess_input(np.array(X_train, dtype='float32'))
+        del X_train
+
+    with profiler.stage('cifar'):
+        with profiler.stage('load_cifar'):
+            X_train, y_train, X_test, y_test = load_cifar()
+        with profiler.stage('to_categorical'):
+            to_categorical(y_train.argmax(-1), 10)
+        with profiler.stage('predict'):
+            initialize_model().predict(X_test, batch_size=256, verbose=0)
+        del X_train, X_test
+
+    with profiler.stage('autoencoder'):
+        with profiler.stage('load_mnist'):
+            X_train, X_test = load_mnist()
+        with profiler.stage('noisy_copies'):
+            X_noisy = np.clip(X_train + 0.3 * np.random.normal(size=X_train.shape), 0., 1.)
+        with profiler.stage('predict'):
+            build_autoencoder(build_encoder(2), build_decoder(2)).predict(X_noisy[:10000], batch_size=256,
+                                                                            verbose=0)
+        del X_noisy
+    return profiler.report()
+
+
+def main(output='memory.json', baseline=None, data_path=None):
+    profiler = MemoryProfiler()
+    with profiler:
+        report = run(profiler, data_path)
+    print_table([{k: row[k] for k in ('stage', 'seconds', 'start_rss_mb', 'peak_increase_mb', 'retained_mb',
+                                      'traced_peak_mb')} for row in report])
+    profiler.write(output)
+    print(f'Timeline written to {output}')
+    if baseline:
+        regressions = compare_reports(load_report(baseline), report)
+        print_table(regressions) if regressions else print('No memory regression')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
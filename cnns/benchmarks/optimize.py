@@ -0,0 +1,58 @@
+'''Parity and CPU latency of `optimize_for_inference` + `compile_inference`
+
+    python -m cnns.benchmarks.optimize [cifar_weights.h5] [flowers_weights.h5] [num_images]
+
+Compares, on the CIFAR `initialize_model` and the flowers `load_own_model`,
+Keras `predict`, a direct call of the model, and the optimised model
+compiled for a static batch shape (with and without XLA).
+'''
+
+import sys
+
+import numpy as np
+
+from cnns.benchmarks import print_table
+from cnns.cifar import compile_model, initialize_model
+from cnns.export import check_parity
+from cnns.optimize import compile_inference, optimize_for_inference
+from cnns.timing import time_call
+from cnns.transfer import load_own_model
+
+
+def run(name, model, X, batch_size=32):
+    optimized = optimize_for_inference(model)
+    candidates = {
+        'keras_predict': lambda X: model.predict(X, batch_size=batch_size, verbose=0),
+        'model_call': lambda X: model(X, training=False).numpy(),
+        'static': compile_inference(model, batch_size),
+        'static_xla': compile_inference(model, batch_size, jit_compile=True),
+    }
+    reference = candidates['keras_predict']
+    rows = []
+    for variant, predict in candidates.items():
+        parity = check_parity(reference, predict, X, atol=1e-5)
+        rows.append({
+            'model': name,
+            'variant': variant,
+            'layers': len(model.layers) if variant in ('keras_predict', 'model_call') else len(optimized.layers),
+            'latency_ms_per_img': time_call(lambda: predict(X), repeats=10) * 1000 / len(X),
+            'max_abs_diff': parity['max_abs_diff'],
+        })
+    return rows
+
+
+def main(cifar_weights=None, flowers_weights=None, num_images=256):
+    num_images = int(num_images)
+    rng = np.random.default_rng(0)
+    cifar = compile_model(initialize_model())
+    flowers = load_own_model()
+    for model, weights in ((cifar, cifar_weights), (flowers, flowers_weights)):
+        if weights:
+            model.load_weights(weights)
+    rows = run('cifar', cifar, rng.random((num_images, 32, 32, 3), dtype='float32'))
+    rows += run('flowers', flowers, rng.integers(0, 256, (num_images // 4, 256, 256, 3)).astype('float32'))
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,62 @@
+'''Incremental PCA against the convolutional autoencoder, per latent dimension
+
+    python -m cnns.benchmarks.pca [epochs] [latent_dimensions...]
+
+For each latent dimension (default: the notebook's range(2, 20, 3)):
+fit time, encode and decode throughput on the test set and test MSE. The
+PCA is fitted once, in chunks, and its fit time is shared by every row.
+'''
+
+import sys
+import time
+
+import numpy as np
+
+from cnns.autoencoder import build_autoencoder, build_decoder, build_encoder, compile_autoencoder, load_mnist
+from cnns.benchmarks import print_table
+from cnns.pca import IncrementalPCA, build_pca_decoder, build_pca_encoder
+
+
+def _row(method, latent_dimension, fit_seconds, encoder, decoder, X_test, batch_size=256):
+    start = time.perf_counter()
+    Z = encoder.predict(X_test, batch_size=batch_size, verbose=0)
+    encode_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    reconstruction = decoder.predict(Z, batch_size=batch_size, verbose=0)
+    decode_seconds = time.perf_counter() - start
+    return {
+        'method': method,
+        'latent_dimension': latent_dimension,
+        'fit_seconds': fit_seconds,
+        'encode_per_sec': len(X_test) / encode_seconds,
+        'decode_per_sec': len(X_test) / decode_seconds,
+        'test_mse': float(np.mean((reconstruction - X_test) ** 2)),
+    }
+
+
+def run(X_train, X_test, latent_dimensions=range(2, 20, 3), epochs=20, batch_size=32):
+    start = time.perf_counter()
+    pca = IncrementalPCA().fit(X_train)
+    pca.components(1)  # the eigendecomposition is part of the fit
+    pca_seconds = time.perf_counter() - start
+
+    rows = []
+    for latent_dimension in latent_dimensions:
+        rows.append(_row('pca', latent_dimension, pca_seconds,
+                         build_pca_encoder(pca, latent_dimension), build_pca_decoder(pca, latent_dimension), X_test))
+        encoder, decoder = build_encoder(latent_dimension), build_decoder(latent_dimension)
+        autoencoder = build_autoencoder(encoder, decoder)
+        compile_autoencoder(autoencoder)
+        start = time.perf_counter()
+        autoencoder.fit(X_train, X_train, epochs=epochs, batch_size=batch_size, verbose=0)
+        rows.append(_row('autoencoder', latent_dimension, time.perf_counter() - start, encoder, decoder, X_test))
+    return rows
+
+
+def main(epochs=20, *latent_dimensions):
+    X_train, X_test = load_mnist()
+    print_table(run(X_train, X_test, [int(d) for d in latent_dimensions] or range(2, 20, 3), int(epochs)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,38 @@
+'''Accuracy vs FLOPs/latency curve of the channel-pruned homemade CNNs
+
+    python -m cnns.benchmarks.pruning [cifar_weights.h5] [flowers_weights.h5] [l1|activation]
+
+Each model is trained briefly when no weights are given, then pruned at
+increasing ratios and fine-tuned for a few epochs.
+'''
+
+import sys
+
+from cnns.benchmarks import print_table, train_or_load
+from cnns.cifar import compile_model, initialize_model, load_cifar
+from cnns.pruning import pruning_curve
+from cnns.transfer import load_flowers_mirror, load_own_model
+
+RATIOS = (0, 0.25, 0.5, 0.75)
+
+
+def main(cifar_weights=None, flowers_weights=None, method='l1'):
+    rows = []
+    X_train, y_train, X_test, y_test = load_cifar(reduction_factor=10)
+    n_val = len(X_train) // 5
+    X_val, y_val, X_train, y_train = X_train[:n_val], y_train[:n_val], X_train[n_val:], y_train[n_val:]
+    cifar = train_or_load(compile_model(initialize_model()), X_train, y_train, X_val, y_val, cifar_weights)
+    for row in pruning_curve(cifar, RATIOS, X_train, y_train, X_val, y_val, X_test, y_test, method):
+        rows.append(dict(model='cifar', **row))
+
+    X_train, y_train, X_val, y_val, X_test, y_test, num_classes = load_flowers_mirror()
+    own = train_or_load(load_own_model(X_train.shape[1:], num_classes), X_train, y_train, X_val, y_val,
+                        flowers_weights, batch_size=16)
+    for row in pruning_curve(own, RATIOS, X_train, y_train, X_val, y_val, X_test, y_test, method,
+                             batch_size=16):
+        rows.append(dict(model='flowers', **row))
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
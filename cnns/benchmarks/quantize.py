@@ -0,0 +1,45 @@
+'''int8 quantisation report for the CIFAR and VGG16 flowers classifiers
+
+    python -m cnns.benchmarks.quantize [cifar_weights.h5] [vgg16_weights.h5]
+
+The data comes from the offline mirror (`cnns.datasets`).
+'''
+
+import sys
+
+from cnns.benchmarks import print_table
+from cnns.cifar import compile_model, initialize_model, load_cifar
+from cnns.quantize import quantization_report
+from cnns.transfer import build_model, load_flowers_mirror
+
+
+def _row(name, report):
+    return {
+        'model': name,
+        'float_accuracy': report['float32']['accuracy'],
+        'int8_accuracy': report['int8']['accuracy'],
+        'accuracy_drop': report['accuracy_drop'],
+        'float_mb': report['float32']['size_mb'],
+        'int8_mb': report['int8']['size_mb'],
+        'speedup': report['speedup'],
+    }
+
+
+def main(cifar_weights=None, vgg_weights=None):
+    rows = []
+    X_train, _, X_test, y_test = load_cifar(reduction_factor=10)
+    cifar = compile_model(initialize_model())
+    if cifar_weights:
+        cifar.load_weights(cifar_weights)
+    rows.append(_row('cifar', quantization_report(cifar, X_train, X_test, y_test)))
+
+    X_train, _, _, _, X_test, y_test, num_classes = load_flowers_mirror()
+    vgg = build_model(input_shape=X_train.shape[1:], num_classes=num_classes)
+    if vgg_weights:
+        vgg.load_weights(vgg_weights)
+    rows.append(_row('vgg16', quantization_report(vgg, X_train, X_test, y_test, backbone='vgg16')))
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,93 @@
+'''Cold-start read throughput: record shards vs loose files vs in-memory arrays
+
+    python -m cnns.benchmarks.records [records_dir] [flowers_dir]
+
+Writes the CIFAR and flowers shards under `records_dir` (default: a
+temporary directory) if they are missing, then reads one full epoch of
+each source. Before every read the files are dropped from the page cache
+(posix_fadvise), so the timings include the disk, as on a fresh node.
+The in-memory path is timed from the mirror's `.npy` cache. The flowers
+are skipped when neither `flowers_dir` nor the mirror has their images.
+'''
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from cnns.benchmarks import print_table
+from cnns.data import ImageFolder
+from cnns.datasets import FLOWERS_CLASSES, FLOWERS_IMAGE_SIZE, flowers_dir, load_data, mirror_dir
+from cnns.records import read_index, read_records, write_cifar, write_flowers
+
+
+def evict(paths):
+    '''Drop `paths` (files or directory trees) from the page cache'''
+    for path in paths:
+        files = [path] if os.path.isfile(path) else [os.path.join(root, name)
+                                                     for root, _, names in os.walk(path) for name in names]
+        for name in files:
+            fd = os.open(name, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+
+def _row(dataset, source, n, seconds):
+    return {'dataset': dataset, 'source': source, 'images': n, 'seconds': seconds, 'images_per_sec': n / seconds}
+
+
+def time_records(path, batch_size=64):
+    evict([path])
+    start = time.perf_counter()
+    n = sum(len(y) for _, y in read_records(path, batch_size))
+    return n, time.perf_counter() - start
+
+
+def time_in_memory(name, batch_size=64):
+    evict([os.path.join(mirror_dir(), 'cache', name)])
+    start = time.perf_counter()
+    (x_train, _), _ = load_data(name)
+    x_train = np.array(x_train)  # materialise the memory map, as cifar10.load_data() does
+    for i in range(0, len(x_train), batch_size):
+        x_train[i:i + batch_size].astype('float32')
+    return len(x_train), time.perf_counter() - start
+
+
+def time_loose_files(directory, batch_size=64):
+    evict([directory])
+    start = time.perf_counter()
+    folder = ImageFolder(directory, FLOWERS_CLASSES, FLOWERS_IMAGE_SIZE)
+    for i in range(0, len(folder), batch_size):
+        folder.load(np.arange(i, min(i + batch_size, len(folder)))).astype('float32')
+    return len(folder), time.perf_counter() - start
+
+
+def run(records_dir, data_path=None):
+    '''Rows for CIFAR, and for the flowers when their images are available'''
+    cifar, flowers = os.path.join(records_dir, 'cifar'), os.path.join(records_dir, 'flowers')
+    data_path = data_path or flowers_dir()
+    if not os.path.exists(os.path.join(cifar, 'train', 'index.json')):
+        write_cifar(cifar)
+    rows = [_row('cifar', 'in_memory', *time_in_memory('cifar10')),
+            _row('cifar', 'records', *time_records(os.path.join(cifar, 'train')))]
+    if not data_path:
+        return rows
+    if not os.path.exists(os.path.join(flowers, 'train', 'index.json')):
+        write_flowers(flowers, data_path)
+    rows.append(_row('flowers', 'loose_files', *time_loose_files(data_path)))
+    flowers_counts = sum(read_index(os.path.join(flowers, split))['count'] for split in ('train', 'val', 'test'))
+    seconds = sum(time_records(os.path.join(flowers, split))[1] for split in ('train', 'val', 'test'))
+    rows.append(_row('flowers', 'records', flowers_counts, seconds))
+    return rows
+
+
+def main(records_dir=None, data_path=None):
+    print_table(run(records_dir or tempfile.mkdtemp(), data_path))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,81 @@
+'''Render time of the NumPy renderers against matplotlib
+
+    python -m cnns.benchmarks.rendering [output_dir]
+
+Latent density image vs `plt.scatter` for growing numbers of points, and
+image montages vs the notebooks' one-figure-per-image loops.
+'''
+
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from cnns.benchmarks import print_table
+from cnns.rendering import render_latent_density, write_montages
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _scatter(Z, labels, path):
+    fig, ax = plt.subplots(figsize=(5.12, 5.12), dpi=100)
+    ax.scatter(Z[:, 0], Z[:, 1], c=labels, cmap='tab10', s=1)
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def latent_rows(output_dir, sizes=(10**4, 10**5, 10**6), scatter_limit=10**5):
+    rng = np.random.default_rng(0)
+    rows = []
+    for n in sizes:
+        labels = rng.integers(0, 10, n)
+        Z = rng.normal(size=(n, 2)) * 0.3 + np.stack([np.cos(labels), np.sin(labels)], axis=1)
+        density = _timed(lambda: render_latent_density(Z, labels, os.path.join(output_dir, 'density.png')))
+        rows.append({'render': 'latent_density', 'items': n, 'seconds': density})
+        if n <= scatter_limit:
+            scatter = _timed(lambda: _scatter(Z, labels, os.path.join(output_dir, 'scatter.png')))
+            rows.append({'render': 'plt.scatter', 'items': n, 'seconds': scatter})
+    return rows
+
+
+def _subplot_loop(images, output_dir):
+    for i, image in enumerate(images):
+        fig, ax = plt.subplots(figsize=(2, 2))
+        ax.imshow(image, cmap='gray')
+        fig.savefig(os.path.join(output_dir, f'image_{i}.png'))
+        plt.close(fig)
+
+
+def montage_rows(output_dir, sizes=(100, 1000, 5000), loop_limit=100):
+    rng = np.random.default_rng(0)
+    rows = []
+    for n in sizes:
+        X = rng.random((n, 28, 28, 1))
+        pattern = os.path.join(output_dir, 'montage_{}.png')
+        seconds = _timed(lambda: write_montages([X, 1 - X], pattern, per_page=400, scale=2))
+        rows.append({'render': 'montage', 'items': n, 'seconds': seconds})
+        if n <= loop_limit:
+            loop = _timed(lambda: _subplot_loop(X, output_dir))
+            rows.append({'render': 'subplot_loop', 'items': n, 'seconds': loop})
+    return rows
+
+
+def run(output_dir):
+    return latent_rows(output_dir) + montage_rows(output_dir)
+
+
+def main(output_dir=None):
+    print_table(run(output_dir or tempfile.mkdtemp()))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,56 @@
+'''Time to target accuracy: default learning rate vs range test + one-cycle
+
+    python -m cnns.benchmarks.schedules [target_accuracy] [max_epochs] [reduction_factor]
+
+Trains the CIFAR model until its validation accuracy reaches the target
+(or `max_epochs`), once with `compile_model`'s default Adam and once with
+the rate found by `lr_range_test` under a `OneCycle` schedule. The range
+test's own time is included in the second run.
+'''
+
+import sys
+import time
+
+from cnns.benchmarks import print_table
+from cnns.cifar import compile_model, initialize_model, load_cifar
+from cnns.schedules import OneCycle, TimeToTarget, lr_range_test
+
+
+def run(X_train, y_train, X_val, y_val, target=0.55, max_epochs=30, batch_size=32):
+    rows = []
+    for schedule in ('default', 'one_cycle'):
+        model = compile_model(initialize_model())
+        callbacks = [TimeToTarget(target)]
+        start, cpu_start = time.perf_counter(), time.process_time()
+        lr = float(model.optimizer.learning_rate.numpy())
+        if schedule == 'one_cycle':
+            lr = lr_range_test(model, X_train, y_train, batch_size=batch_size)['suggested_lr']
+            callbacks.append(OneCycle(lr))
+        search_seconds, search_cpu = time.perf_counter() - start, time.process_time() - cpu_start
+        history = model.fit(X_train, y_train,
+                            validation_data=(X_val, y_val),
+                            epochs=max_epochs,
+                            batch_size=batch_size,
+                            callbacks=callbacks,
+                            verbose=0)
+        timer = callbacks[0]
+        rows.append({
+            'schedule': schedule,
+            'lr': lr,
+            'epochs_to_target': timer.reached_epoch or f'>{max_epochs}',
+            'seconds': search_seconds + timer.seconds,
+            'cpu_hours': (search_cpu + timer.cpu_seconds) / 3600,
+            'best_val_accuracy': max(history.history['val_accuracy']),
+        })
+    return rows
+
+
+def main(target=0.55, max_epochs=30, reduction_factor=5):
+    X_train, y_train, _, _ = load_cifar(int(reduction_factor))
+    split = int(len(X_train) * 0.8)
+    print_table(run(X_train[:split], y_train[:split], X_train[split:], y_train[split:],
+                    float(target), int(max_epochs)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
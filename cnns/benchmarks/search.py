@@ -0,0 +1,55 @@
+'''Parallel speed-up of the hyper-parameter search on the CIFAR model
+
+    python -m cnns.benchmarks.search [max_jobs] [reduction_factor]
+
+Runs the same small grid over `initialize_model` (compiled by the search
+with each learning rate) with 1, 2, 4... trial processes sharing the
+cores, and fails if any trial does not complete.
+'''
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from cnns.benchmarks import print_table
+from cnns.cifar import initialize_model, load_cifar
+from cnns.search import Search
+
+SPACE = {'learning_rate': [1e-3, 3e-4], 'batch_size': [32, 64], 'epochs': [2]}
+
+
+def cifar_data():
+    '''CIFAR subsample, the `data_fn` of the search (run in the trial processes)'''
+    # The spawned trial processes inherit the environment, not the arguments of main()
+    return load_cifar(int(os.environ.get('CNNS_SEARCH_REDUCTION_FACTOR', 25)))
+
+
+def run(job_counts=(1, 2, 4), space=SPACE):
+    rows = []
+    for n_jobs in job_counts:
+        store = os.path.join(tempfile.mkdtemp(), 'search.sqlite')
+        search = Search(initialize_model, cifar_data, space, store, prune=False, trial_seed=0)
+        start = time.perf_counter()
+        search.run(n_jobs=n_jobs)
+        seconds = time.perf_counter() - start
+        trials = search.store.trials()
+        failed = [t for t in trials if t['status'] != 'complete']
+        if failed:
+            raise RuntimeError(f'{len(failed)} trials did not complete, e.g. {failed[0]["error"]}')
+        rows.append({'jobs': n_jobs, 'trials': len(trials), 'seconds': seconds,
+                     'best_val_accuracy': search.best()['value']})
+    for row in rows:
+        row['speedup'] = rows[0]['seconds'] / row['seconds']
+    return rows
+
+
+def main(max_jobs=4, reduction_factor=25):
+    os.environ['CNNS_SEARCH_REDUCTION_FACTOR'] = str(int(reduction_factor))
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    print_table(run([k for k in (1, 2, 4, 8, 16) if k <= int(max_jobs)]))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,96 @@
+'''Local load generator for the micro-batching server
+
+    python -m cnns.benchmarks.serving [vgg16_weights.h5]
+
+Starts `InferenceServer` on a free local port for several batch sizes and
+fires `num_requests` single-image POSTs from `concurrency` keep-alive
+clients. `max_batch_size=1` is the one-predict-per-request baseline.
+'''
+
+import asyncio
+import io
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from cnns.benchmarks import print_table
+from cnns.serving import InferenceServer, MicroBatcher
+
+
+async def _client(host, port, bodies, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    for body in bodies:
+        start = time.perf_counter()
+        writer.write(f'POST /predict HTTP/1.1\r\nHost: {host}\r\n'
+                     f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+        await writer.drain()
+        headers = {}
+        status = await reader.readline()
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        await reader.readexactly(int(headers['content-length']))
+        if b' 200 ' not in status:
+            raise RuntimeError(f'Request failed: {status!r}')
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def generate_load(host, port, body, num_requests=1000, concurrency=64):
+    '''Client-side latencies (s) and the wall time of `num_requests` requests'''
+    latencies = []
+    per_client = [[body] * (num_requests // concurrency + (i < num_requests % concurrency))
+                  for i in range(min(concurrency, num_requests))]
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, bodies, latencies) for bodies in per_client))
+    return np.array(latencies), time.perf_counter() - start
+
+
+def encoded_image(size=(256, 256)):
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.randint(0, 256, size + (3,), dtype='uint8')).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def run(predict_fn, batch_sizes=(1, 8, 32), max_latency_ms=5., num_requests=1000,
+        concurrency=64, image_size=(256, 256)):
+    body = encoded_image(image_size)
+    rows = []
+    for max_batch_size in batch_sizes:
+        async def bench():
+            server = InferenceServer(MicroBatcher(predict_fn, max_batch_size, max_latency_ms), image_size)
+            host, port = await server.start(port=0)
+            try:
+                latencies, duration = await generate_load(host, port, body, num_requests, concurrency)
+            finally:
+                await server.stop()
+            return latencies, duration, server.batcher.metrics()
+
+        latencies, duration, metrics = asyncio.run(bench())
+        rows.append({
+            'max_batch_size': max_batch_size,
+            'requests_per_s': len(latencies) / duration,
+            'client_p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'client_p99_ms': float(np.percentile(latencies, 99) * 1000),
+            'server_p50_ms': metrics['latency_p50_ms'],
+            'server_p99_ms': metrics['latency_p99_ms'],
+            'batch_fill': metrics['batch_fill'],
+        })
+    return rows
+
+
+def main(weights=None):
+    from cnns.export import with_preprocessing
+    from cnns.transfer import build_model
+
+    model = build_model(weights=None if weights else 'imagenet')
+    if weights:
+        model.load_weights(weights)
+    served = with_preprocessing(model)
+    print_table(run(lambda X: served(X, training=False).numpy()))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
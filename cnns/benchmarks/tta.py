@@ -0,0 +1,51 @@
+'''Accuracy gain against latency cost of test-time augmentation
+
+    python -m cnns.benchmarks.tta [cifar_weights.h5] [flowers_weights.h5]
+
+Evaluates the CIFAR model and the homemade flowers CNN with 1 (no TTA)
+to 10 views. Without weights the models are trained briefly first.
+'''
+
+import sys
+
+import numpy as np
+
+from cnns.benchmarks import print_table, train_or_load
+from cnns.cifar import compile_model, initialize_model, load_cifar
+from cnns.timing import time_call
+from cnns.transfer import load_flowers_mirror, load_own_model
+from cnns.tta import MAX_VIEWS, tta_evaluate, tta_predict
+
+VIEWS = (1, 2, 4, 6, MAX_VIEWS)
+
+
+def run(name, model, X_test, y_test, views=VIEWS, batch_size=32):
+    batch = np.asarray(X_test[:batch_size], dtype='float32')
+    rows = []
+    for num_views in views:
+        rows.append({
+            'model': name,
+            'views': num_views,
+            'accuracy': tta_evaluate(model, X_test, y_test, num_views, batch_size),
+            'latency_ms_per_img': time_call(lambda: tta_predict(model, batch, num_views, batch_size),
+                                            repeats=10) * 1000 / len(batch),
+        })
+    return rows
+
+
+def main(cifar_weights=None, flowers_weights=None):
+    X_train, y_train, X_test, y_test = load_cifar(reduction_factor=10)
+    n_val = len(X_train) // 5
+    cifar = train_or_load(compile_model(initialize_model()), X_train[n_val:], y_train[n_val:],
+                          X_train[:n_val], y_train[:n_val], cifar_weights)
+    rows = run('cifar', cifar, X_test, y_test)
+
+    X_train, y_train, X_val, y_val, X_test, y_test, num_classes = load_flowers_mirror()
+    own = train_or_load(load_own_model(X_train.shape[1:], num_classes), X_train, y_train, X_val, y_val,
+                        flowers_weights, batch_size=16)
+    rows += run('flowers', own, X_test, y_test, batch_size=16)
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
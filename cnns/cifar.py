@@ -0,0 +1,73 @@
+'''CIFAR-10 data and model from the CIFAR classification notebook'''
+
+import numpy as np
+from tensorflow.keras import Sequential
+from tensorflow.keras.layers import Conv2D, Dense, Dropout, Flatten, MaxPooling2D
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.utils import to_categorical
+
+from cnns.datasets import load_data
+
+LABELS = ['airplane',
+          'automobile',
+          'bird',
+          'cat',
+          'deer',
+          'dog',
+          'frog',
+          'horse',
+          'ship',
+          'truck']
+
+
+def load_cifar(reduction_factor=1, mirror=None, normalize=True):
+    '''Normalised images and one-hot labels, optionally on a random 1/`reduction_factor` subsample
+
+    With `normalize=False` the images stay uint8 (4x smaller than float32,
+    8x than the float64 of the division), to be divided by 255 per batch.
+    '''
+    (images_train, labels_train), (images_test, labels_test) = load_data('cifar10', mirror)
+    if reduction_factor > 1:
+        idx_train = np.random.choice(len(images_train), round(len(images_train)/reduction_factor), replace=False)
+        idx_test = np.random.choice(len(images_test), round(len(images_test)/reduction_factor), replace=False)
+        images_train, labels_train = images_train[idx_train], labels_train[idx_train]
+        images_test, labels_test = images_test[idx_test], labels_test[idx_test]
+
+    X_train = images_train / 255. if normalize else np.asarray(images_train)
+    X_test = images_test / 255. if normalize else np.asarray(images_test)
+    y_train = to_categorical(labels_train, 10)
+    y_test = to_categorical(labels_test, 10)
+    return X_train, y_train, X_test, y_test
+
+
+def initialize_model():
+
+    model = Sequential()
+
+    model.add(Conv2D(16, (3, 3), activation = 'relu', padding = 'same', input_shape=(32, 32, 3)))
+    model.add(MaxPooling2D((2, 2)))
+
+    model.add(Dropout(0.2))
+
+    model.add(Conv2D(32, (3, 3), activation = 'relu', padding = 'same'))
+    model.add(MaxPooling2D((2, 2)))
+
+    model.add(Dropout(0.2))
+
+    model.add(Conv2D(64, (2, 2), activation = 'relu', padding = 'same'))
+    model.add(Dropout(0.3))
+    model.add(MaxPooling2D((2, 2)))
+
+    model.add(Flatten())
+    model.add(Dense(100, activation = 'relu'))
+    model.add(Dropout(0.4))
+    model.add(Dense(10, activation = 'softmax'))
+
+    return model
+
+
+def compile_model(model, learning_rate=1e-3):
+    model.compile(loss = 'categorical_crossentropy',
+                  optimizer = Adam(learning_rate=learning_rate),
+                  metrics = ['accuracy'])
+    return model
@@ -0,0 +1,152 @@
+'''Command line interface: train, evaluate and benchmark the notebook models
+
+    python -m cnns train cifar --epochs 20 --output cifar.h5
+    python -m cnns train vgg16 --head avg --data-path flowers/ --output vgg16.h5
+    python -m cnns evaluate vgg16 vgg16.h5 --head avg --data-path flowers/ --tta 4
+    python -m cnns bench heads flowers/
+
+TensorFlow is imported inside the commands only, so `--help` is instant.
+'''
+
+import argparse
+import importlib
+import os
+import pkgutil
+import sys
+
+MODELS = ('cifar', 'flowers', 'vgg16', 'autoencoder')
+
+
+def load_task(args):
+    '''Model and (X_train, y_train, validation_data, X_test, y_test) for `args.model`'''
+    if args.seed is not None:
+        from cnns.reproducibility import set_seed
+        set_seed(args.seed)
+
+    if args.model == 'cifar':
+        from cnns.cifar import compile_model, initialize_model, load_cifar
+        X_train, y_train, X_test, y_test = load_cifar(args.reduction_factor, args.mirror)
+        split = int(len(X_train) * 0.8)
+        return (compile_model(initialize_model()),
+                X_train[:split], y_train[:split], (X_train[split:], y_train[split:]), X_test, y_test)
+
+    if args.model == 'autoencoder':
+        from cnns.autoencoder import build_autoencoder, build_decoder, build_encoder, compile_autoencoder, load_mnist
+        X_train, X_test = load_mnist(args.mirror)
+        autoencoder = build_autoencoder(build_encoder(args.latent_dimension), build_decoder(args.latent_dimension))
+        compile_autoencoder(autoencoder)
+        return autoencoder, X_train, X_train, None, X_test, X_test
+
+    from cnns import transfer
+    if args.data_path:
+        data = transfer.load_flowers_data(args.data_path)
+    else:
+        data = transfer.load_flowers_mirror(args.mirror)
+    X_train, y_train, X_val, y_val, X_test, y_test, num_classes = data
+    if args.model == 'flowers':
+        model = transfer.load_own_model(X_train.shape[1:], num_classes)
+    else:
+        from cnns.backbones import get_preprocess_input
+        preprocess_input = get_preprocess_input(args.backbone)
+        X_train, X_val, X_test = (preprocess_input(X.astype('float32')) for X in (X_train, X_val, X_test))
+        model = transfer.build_model(args.head, X_train.shape[1:], num_classes, args.backbone,
+                                     weights_dir=args.weights_dir)
+    return model, X_train, y_train, (X_val, y_val), X_test, y_test
+
+
+def train(args):
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    model, X_train, y_train, validation_data, X_test, y_test = load_task(args)
+    callbacks = []
+    if validation_data is not None:
+        callbacks.append(EarlyStopping(monitor='val_loss', patience=args.patience, restore_best_weights=True))
+    if args.track:
+        from cnns.tracking import Tracker
+        callbacks.append(Tracker(args.track).callback(args.model, args.batch_size, len(X_train), vars(args)))
+
+    model.fit(X_train, y_train,
+              validation_data=validation_data,
+              epochs=args.epochs,
+              batch_size=args.batch_size,
+              callbacks=callbacks)
+    _print_evaluation(model, X_test, y_test, args.batch_size)
+    if args.output:
+        model.save_weights(args.output)
+        print(f'Weights saved to {args.output}')
+
+
+def evaluate(args):
+    model, _, _, _, X_test, y_test = load_task(args)
+    model.load_weights(args.weights)
+    _print_evaluation(model, X_test, y_test, args.batch_size)
+    if args.tta > 1:
+        from cnns.tta import tta_evaluate
+        print({f'tta_accuracy@{args.tta}': tta_evaluate(model, X_test, y_test, args.tta, args.batch_size)})
+
+
+def bench(args):
+    module = importlib.import_module(f'cnns.benchmarks.{args.benchmark}')
+    module.main(*args.args)
+
+
+def _print_evaluation(model, X_test, y_test, batch_size):
+    result = model.evaluate(X_test, y_test, batch_size=batch_size, verbose=0)
+    # metrics_names is only filled once the model has been evaluated
+    print(dict(zip(model.metrics_names, result if isinstance(result, list) else [result])))
+
+
+def benchmarks():
+    '''Benchmark modules, found without importing them'''
+    path = os.path.join(os.path.dirname(__file__), 'benchmarks')
+    return sorted(m.name for m in pkgutil.iter_modules([path]) if not m.name.startswith('_'))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cnns', description='CNN notebooks as a command line tool')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    model_options = argparse.ArgumentParser(add_help=False)
+    model_options.add_argument('model', choices=MODELS)
+    model_options.add_argument('--mirror', help='dataset mirror directory (see cnns.datasets)')
+    model_options.add_argument('--data-path', help='flowers directory, instead of the mirror')
+    model_options.add_argument('--batch-size', type=int, default=32)
+    model_options.add_argument('--seed', type=int, help='reproducibility mode with this seed')
+    model_options.add_argument('--reduction-factor', type=int, default=1, help='cifar: train on 1/n of the data')
+    model_options.add_argument('--latent-dimension', type=int, default=2, help='autoencoder bottleneck size')
+    model_options.add_argument('--backbone', default='vgg16', help='vgg16: pretrained base (cnns.backbones)')
+    model_options.add_argument('--head', default='flatten', help='vgg16: classification head (cnns.heads)')
+    model_options.add_argument('--weights-dir', help='vgg16: local ImageNet weights directory')
+
+    train_parser = commands.add_parser('train', parents=[model_options], help='train a model')
+    train_parser.add_argument('--epochs', type=int, default=20)
+    train_parser.add_argument('--patience', type=int, default=5)
+    train_parser.add_argument('--output', help='where to save the trained weights')
+    train_parser.add_argument('--track', metavar='DB', help='log the run in this tracker database')
+    train_parser.set_defaults(func=train)
+
+    evaluate_parser = commands.add_parser('evaluate', parents=[model_options], help='evaluate trained weights')
+    evaluate_parser.add_argument('weights')
+    evaluate_parser.add_argument('--tta', type=int, default=1, metavar='VIEWS',
+                                 help='classifiers: also report the accuracy averaged over this many flip/shift views')
+    evaluate_parser.set_defaults(func=evaluate)
+
+    bench_parser = commands.add_parser('bench', help='run one of cnns.benchmarks')
+    bench_parser.add_argument('benchmark', choices=benchmarks())
+    bench_parser.add_argument('args', nargs=argparse.REMAINDER,
+                              help='arguments of the benchmark main(), as on its own command line')
+    bench_parser.set_defaults(func=bench)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'evaluate' and args.tta > 1 and args.model == 'autoencoder':
+        # Flipped or shifted reconstructions of flipped inputs are not comparable to one target
+        parser.error('--tta only applies to the classifiers, not to the autoencoder')
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
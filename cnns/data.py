@@ -0,0 +1,99 @@
+'''Directory-backed image datasets that decode pixels batch by batch
+
+`load_flowers_data` keeps every image in memory as uint8 256x256x3, which
+is why the notebook caps each class at 300 images. Here the directory tree
+is only indexed (paths and labels), shuffling and splitting work on index
+arrays, and `ImageSequence` decodes one batch at a time, so memory stays
+constant whatever the size of the corpus.
+
+    folder = ImageFolder('flowers/')
+    train, val, test = split_indices(len(folder))
+    train_seq = ImageSequence(folder, train, batch_size=16, preprocess=preprocess_input)
+    model.fit(train_seq, validation_data=ImageSequence(folder, val, batch_size=16, ...))
+'''
+
+import os
+
+import numpy as np
+from PIL import Image
+from tensorflow.keras.utils import Sequence
+
+from cnns.reproducibility import numpy_rng
+
+
+class ImageFolder:
+    '''Index of a `root/<class>/<image>.jpg` tree: no pixel is read here'''
+
+    def __init__(self, root, classes=None, image_size=(256, 256), extensions=('.jpg',), max_per_class=None):
+        self.root = root
+        self.image_size = image_size
+        if classes is None:
+            classes = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+        self.classes = dict(classes) if isinstance(classes, dict) else {cl: i for i, cl in enumerate(classes)}
+
+        paths, labels = [], []
+        for cl, i in self.classes.items():
+            names = [elt for elt in os.listdir(os.path.join(root, cl)) if elt.lower().endswith(extensions)]
+            names = sorted(names)[:max_per_class]
+            paths.extend(os.path.join(root, cl, name) for name in names)
+            labels.extend([i] * len(names))
+        self.paths = np.array(paths)
+        self.labels = np.array(labels, dtype='int64')
+
+    @property
+    def num_classes(self):
+        return len(self.classes)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def load(self, indices):
+        '''Decode the images at `indices` into a (n, height, width, 3) uint8 array'''
+        X = np.empty((len(indices),) + tuple(self.image_size) + (3,), dtype='uint8')
+        for j, i in enumerate(indices):
+            with Image.open(self.paths[i]) as image:
+                X[j] = np.asarray(image.convert('RGB').resize(self.image_size))
+        return X
+
+
+def split_indices(n, test_fraction=1/6., val_fraction=0.2, rng=None):
+    '''Shuffled train/val/test index arrays, with the ratios of `load_flowers_data`'''
+    rng = numpy_rng(rng)
+    p = rng.permutation(n)
+    first_split = int(n * test_fraction)
+    second_split = first_split + int(n * val_fraction)
+    return p[second_split:], p[first_split:second_split], p[:first_split]
+
+
+class ImageSequence(Sequence):
+    '''Keras `Sequence` yielding (images, one-hot labels) batches of an `ImageFolder`
+
+    Only the indices are shuffled at the end of each epoch; `preprocess` is
+    applied per batch (e.g. the backbone's `preprocess_input`).
+    '''
+
+    def __init__(self, folder, indices, batch_size=16, preprocess=None, shuffle=True, rng=None, **kwargs):
+        super().__init__(**kwargs)
+        self.folder = folder
+        self.indices = np.array(indices)
+        self.batch_size = batch_size
+        self.preprocess = preprocess
+        self.shuffle = shuffle
+        self.rng = numpy_rng(rng)
+        if self.shuffle:
+            self.rng.shuffle(self.indices)
+
+    def __len__(self):
+        return int(np.ceil(len(self.indices) / self.batch_size))
+
+    def __getitem__(self, batch):
+        indices = self.indices[batch * self.batch_size:(batch + 1) * self.batch_size]
+        X = self.folder.load(indices)
+        if self.preprocess is not None:
+            X = self.preprocess(X)
+        y = np.eye(self.folder.num_classes, dtype='float32')[self.folder.labels[indices]]
+        return X, y
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.rng.shuffle(self.indices)
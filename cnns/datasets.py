@@ -0,0 +1,210 @@
+'''Offline provider for the MNIST, CIFAR-10 and flowers datasets
+
+The notebooks download their data (`mnist.load_data()`,
+`cifar10.load_data()`, `!wget ... flowers-dataset.zip`) from Colab. Here
+the archives are read from a local mirror directory (argument, or the
+`CNNS_DATA_DIR` environment variable, default `~/.cnns/data`):
+
+    <mirror>/mnist.npz                    (as downloaded by Keras)
+    <mirror>/cifar-10-python.tar.gz       (or the extracted cifar-10-batches-py/)
+    <mirror>/flowers-dataset.zip          (or the extracted flowers/)
+
+The first load converts the archive into `.npy` files under
+`<mirror>/cache/`, which later loads memory-map instead of parsing the
+archive again. Without a mirror, a synthetic dataset of the same shapes
+and dtypes is generated (with a warning) so the pipelines still run on
+air-gapped nodes.
+'''
+
+import os
+import pickle
+import tarfile
+import tempfile
+import warnings
+import zipfile
+
+import numpy as np
+
+from cnns.data import ImageFolder
+
+SPLITS = ('x_train', 'y_train', 'x_test', 'y_test')
+
+SHAPES = {
+    'mnist': {'x_train': (60000, 28, 28), 'y_train': (60000,), 'x_test': (10000, 28, 28), 'y_test': (10000,)},
+    'cifar10': {'x_train': (50000, 32, 32, 3), 'y_train': (50000, 1),
+                'x_test': (10000, 32, 32, 3), 'y_test': (10000, 1)},
+    'flowers': {'x': (900, 256, 256, 3), 'y': (900,)},
+}
+NUM_CLASSES = {'mnist': 10, 'cifar10': 10, 'flowers': 3}
+FLOWERS_CLASSES = {'daisy': 0, 'dandelion': 1, 'rose': 2}
+FLOWERS_IMAGE_SIZE = (256, 256)
+
+
+def mirror_dir(mirror=None):
+    return os.path.expanduser(mirror or os.environ.get('CNNS_DATA_DIR', '~/.cnns/data'))
+
+
+def _cache_dir(mirror, name):
+    return os.path.join(mirror, 'cache', name)
+
+
+def _cached(mirror, name, keys):
+    cache = _cache_dir(mirror, name)
+    paths = [os.path.join(cache, f'{key}.npy') for key in keys]
+    if all(os.path.exists(path) for path in paths):
+        return [np.load(path, mmap_mode='r') for path in paths]
+    return None
+
+
+def _temp_path(cache, key):
+    '''Fresh temporary file in `cache`, unique across processes converting at once'''
+    fd, tmp = tempfile.mkstemp(dir=cache, prefix=f'{key}.', suffix='.tmp.npy')
+    os.close(fd)
+    return tmp
+
+
+def _publish(tmp, target):
+    '''Move the complete `tmp` to `target`; if another process got there first, keep its file'''
+    if os.path.exists(target):
+        os.remove(tmp)
+    else:
+        os.replace(tmp, target)
+
+
+def _save(mirror, name, arrays):
+    '''Write `{key: array}` to the cache; a file only appears once complete'''
+    cache = _cache_dir(mirror, name)
+    os.makedirs(cache, exist_ok=True)
+    for key, array in arrays.items():
+        tmp = _temp_path(cache, key)
+        np.save(tmp, array)
+        _publish(tmp, os.path.join(cache, f'{key}.npy'))
+
+
+def _convert_mnist(mirror):
+    path = os.path.join(mirror, 'mnist.npz')
+    if not os.path.exists(path):
+        return False
+    with np.load(path) as f:
+        _save(mirror, 'mnist', {key: f[key] for key in SPLITS})
+    return True
+
+
+def _cifar_batches(mirror):
+    '''Yield (name, batch dict) from the extracted directory or the tarball'''
+    directory = os.path.join(mirror, 'cifar-10-batches-py')
+    names = [f'data_batch_{i}' for i in range(1, 6)] + ['test_batch']
+    if os.path.isdir(directory):
+        for name in names:
+            with open(os.path.join(directory, name), 'rb') as f:
+                yield name, pickle.load(f, encoding='bytes')
+        return
+    with tarfile.open(os.path.join(mirror, 'cifar-10-python.tar.gz')) as tar:
+        for name in names:
+            yield name, pickle.load(tar.extractfile(f'cifar-10-batches-py/{name}'), encoding='bytes')
+
+
+def _convert_cifar10(mirror):
+    if not (os.path.isdir(os.path.join(mirror, 'cifar-10-batches-py'))
+            or os.path.exists(os.path.join(mirror, 'cifar-10-python.tar.gz'))):
+        return False
+    train_x, train_y = [], []
+    for name, batch in _cifar_batches(mirror):
+        x = batch[b'data'].reshape(-1, 3, 32, 32).transpose(0, 2, 3, 1)
+        y = np.array(batch[b'labels'], dtype='uint8').reshape(-1, 1)
+        if name == 'test_batch':
+            x_test, y_test = x, y
+        else:
+            train_x.append(x)
+            train_y.append(y)
+    _save(mirror, 'cifar10', {'x_train': np.concatenate(train_x), 'y_train': np.concatenate(train_y),
+                              'x_test': x_test, 'y_test': y_test})
+    return True
+
+
+def flowers_dir(mirror=None):
+    '''Directory of the flowers images, extracting the zip archive once if needed'''
+    mirror = mirror_dir(mirror)
+    directory = os.path.join(mirror, 'flowers')
+    archive = os.path.join(mirror, 'flowers-dataset.zip')
+    if not os.path.isdir(directory) and os.path.exists(archive):
+        with zipfile.ZipFile(archive) as f:
+            f.extractall(mirror)
+    return directory if os.path.isdir(directory) else None
+
+
+def _convert_flowers(mirror, batch_size=64):
+    directory = flowers_dir(mirror)
+    if directory is None:
+        return False
+    folder = ImageFolder(directory, FLOWERS_CLASSES, FLOWERS_IMAGE_SIZE)
+    cache = _cache_dir(mirror, 'flowers')
+    os.makedirs(cache, exist_ok=True)
+    # Decoded straight into the memory-mapped file, batch by batch
+    tmp = _temp_path(cache, 'x')
+    x = np.lib.format.open_memmap(tmp, mode='w+', dtype='uint8',
+                                  shape=(len(folder),) + FLOWERS_IMAGE_SIZE + (3,))
+    for start in range(0, len(folder), batch_size):
+        x[start:start + batch_size] = folder.load(np.arange(start, min(start + batch_size, len(folder))))
+    x.flush()
+    del x
+    _publish(tmp, os.path.join(cache, 'x.npy'))
+    _save(mirror, 'flowers', {'y': folder.labels})
+    return True
+
+
+def synthetic(name, seed=0):
+    '''Random images with the shapes and dtypes of dataset `name`
+
+    The mean intensity depends on the label so that models have something
+    to learn.
+    '''
+    rng = np.random.default_rng(seed)
+    shapes = SHAPES[name]
+    arrays = {}
+    for key in shapes:
+        if not key.startswith('x'):
+            continue
+        label_key = 'y' + key[1:]
+        labels = rng.integers(0, NUM_CLASSES[name], shapes[label_key])
+        offsets = labels.reshape((-1,) + (1,) * (len(shapes[key]) - 1)) * (128 // NUM_CLASSES[name])
+        # uint8 from the start and offset in place: no int64 copy of the images
+        images = rng.integers(0, 128, shapes[key], dtype='uint8')
+        images += offsets.astype('uint8')
+        arrays[key] = images
+        arrays[label_key] = labels.astype('int64' if name == 'flowers' else 'uint8')
+    return arrays
+
+
+CONVERTERS = {'mnist': _convert_mnist, 'cifar10': _convert_cifar10, 'flowers': _convert_flowers}
+
+
+def _load(name, keys, mirror=None, allow_synthetic=True):
+    mirror = mirror_dir(mirror)
+    arrays = _cached(mirror, name, keys)
+    if arrays is None and CONVERTERS[name](mirror):
+        arrays = _cached(mirror, name, keys)
+    if arrays is None:
+        if not allow_synthetic:
+            raise FileNotFoundError(f'No {name} archive in the mirror {mirror}')
+        warnings.warn(f'No {name} archive in the mirror {mirror}: using synthetic data')
+        data = synthetic(name)
+        arrays = [data[key] for key in keys]
+    return arrays
+
+
+def load_data(name, mirror=None, allow_synthetic=True):
+    '''`(x_train, y_train), (x_test, y_test)` of 'mnist' or 'cifar10', like `keras.datasets`
+
+    The arrays are read-only memory maps once the archive has been converted.
+    '''
+    if name not in ('mnist', 'cifar10'):
+        raise ValueError(f"Unknown dataset '{name}', choose 'mnist' or 'cifar10' (or use load_flowers)")
+    x_train, y_train, x_test, y_test = _load(name, SPLITS, mirror, allow_synthetic)
+    return (x_train, y_train), (x_test, y_test)
+
+
+def load_flowers(mirror=None, allow_synthetic=True):
+    '''All the flowers images resized to 256x256 (uint8 memory map) and their labels'''
+    x, y = _load('flowers', ('x', 'y'), mirror, allow_synthetic)
+    return x, y
@@ -0,0 +1,108 @@
+'''Knowledge distillation of the VGG16 transfer model into the homemade CNN
+
+The teacher (`build_model`) is run once over the training and validation
+images and its logits are cached, so training the student
+(`load_own_model`) costs no teacher forward pass. The student is trained
+on a mix of the hard labels and the temperature-softened teacher targets:
+
+    loss = alpha * CE(y, student) + (1 - alpha) * T^2 * KL(teacher_T || student_T)
+
+    logits = teacher_logits(teacher, X_train, cache_path='teacher_train.npy')
+    student = load_own_model()
+    compile_student(student, temperature=4., alpha=0.3)
+    student.fit(X_train, distillation_targets(y_train, logits), ...)
+'''
+
+import hashlib
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from cnns.backbones import get_preprocess_input
+from cnns.timing import time_call
+
+
+def fingerprint(X, batch_size=256):
+    '''SHA-1 of the shape and pixels of `X`, read in batches (works on memory maps)'''
+    digest = hashlib.sha1(repr((np.shape(X), np.asarray(X[:0]).dtype.str)).encode())
+    for i in range(0, len(X), batch_size):
+        digest.update(np.ascontiguousarray(X[i:i + batch_size]).tobytes())
+    return digest.hexdigest()
+
+
+def teacher_logits(teacher, X, backbone='vgg16', batch_size=32, cache_path=None):
+    '''Logits of `teacher` on the raw pixels `X`, computed once and cached in `cache_path`
+
+    The teacher ends with a softmax: its log-probabilities differ from the
+    logits by a per-image constant, which the softmax of the distillation
+    loss cancels out. The fingerprint of `X` is stored next to the cache
+    (`cache_path + '.sha1'`): a cache computed on other images, e.g. another
+    random split, is recomputed instead of being reused.
+    '''
+    if cache_path is not None:
+        key = fingerprint(X)
+        if os.path.exists(cache_path) and os.path.exists(cache_path + '.sha1'):
+            with open(cache_path + '.sha1') as f:
+                if f.read().strip() == key:
+                    return np.load(cache_path)
+    preprocess_input = get_preprocess_input(backbone)
+    logits = np.concatenate([
+        np.log(np.clip(teacher.predict(preprocess_input(np.array(X[i:i + batch_size], dtype='float32')),
+                                       verbose=0), 1e-7, 1.))
+        for i in range(0, len(X), batch_size)
+    ])
+    if cache_path is not None:
+        np.save(cache_path, logits)
+        with open(cache_path + '.sha1', 'w') as f:
+            f.write(key)
+    return logits
+
+
+def distillation_targets(y, logits):
+    '''Hard labels and teacher logits side by side, so `fit` shuffles them together'''
+    return np.concatenate([y, logits], axis=-1).astype('float32')
+
+
+def distillation_loss(num_classes, temperature=4., alpha=0.3):
+    def loss(y_true, y_pred):
+        hard, teacher = y_true[:, :num_classes], y_true[:, num_classes:]
+        student = tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.))
+        soft_teacher = tf.nn.softmax(teacher / temperature)
+        soft_student = tf.nn.log_softmax(student / temperature)
+        kl = tf.reduce_sum(soft_teacher * (tf.math.log(soft_teacher + 1e-7) - soft_student), axis=-1)
+        ce = tf.keras.losses.categorical_crossentropy(hard, y_pred)
+        return alpha * ce + (1 - alpha) * temperature ** 2 * kl
+    return loss
+
+
+def hard_accuracy(num_classes):
+    '''Accuracy against the hard labels of the distillation targets'''
+    def accuracy(y_true, y_pred):
+        return tf.keras.metrics.categorical_accuracy(y_true[:, :num_classes], y_pred)
+    return accuracy
+
+
+def compile_student(student, num_classes=3, temperature=4., alpha=0.3, learning_rate=1e-4):
+    student.compile(loss=distillation_loss(num_classes, temperature, alpha),
+                    optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                    metrics=[hard_accuracy(num_classes)])
+    return student
+
+
+def compare(teacher, student, X_test, y_test, backbone='vgg16', batch_size=32):
+    '''Test accuracy and per-image CPU latency of teacher and student on raw pixels'''
+    preprocess_input = get_preprocess_input(backbone)
+    batch = np.array(X_test[:batch_size], dtype='float32')
+    predict_teacher = lambda X: teacher(preprocess_input(np.array(X, dtype='float32')), training=False).numpy()
+    predict_student = lambda X: student(np.asarray(X, dtype='float32'), training=False).numpy()
+    rows = []
+    for name, predict in (('teacher', predict_teacher), ('student', predict_student)):
+        predictions = np.concatenate([predict(X_test[i:i + batch_size]) for i in range(0, len(X_test), batch_size)])
+        rows.append({
+            'model': name,
+            'params': (teacher if name == 'teacher' else student).count_params(),
+            'accuracy': float(np.mean(predictions.argmax(-1) == np.asarray(y_test).argmax(-1))),
+            'latency_ms_per_img': time_call(lambda: predict(batch), repeats=10) * 1000 / len(batch),
+        })
+    return rows
@@ -0,0 +1,147 @@
+'''Data-parallel training of the CIFAR model over several worker processes
+
+`train_multi_worker` starts `num_workers` processes on this host with a
+local cluster spec (TF_CONFIG) and trains `initialize_model`/`compile_model`
+under `MultiWorkerMirroredStrategy`: each worker reads its own shard of the
+training set, gradients are all-reduced after every step, and the chief
+(worker 0) reports the timings.
+
+    result = train_multi_worker(num_workers=4, epochs=3, reduction_factor=5)
+    result['images_per_sec']
+
+The same workers run on several machines by passing their `host:port`
+addresses as `cluster` and starting `python -m cnns.distributed` on each.
+The batch size is per worker: the global batch grows with the workers.
+'''
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def local_cluster(num_workers):
+    '''`host:port` addresses of `num_workers` free ports on localhost'''
+    sockets = [socket.socket() for _ in range(num_workers)]
+    try:
+        for s in sockets:
+            s.bind(('localhost', 0))
+        return [f'localhost:{s.getsockname()[1]}' for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
+
+
+def train_multi_worker(num_workers=2, epochs=2, batch_size=32, reduction_factor=1, mirror=None, seed=0,
+                       threads_per_worker=None, cluster=None, timeout=None):
+    '''Train on `num_workers` local processes; returns the chief's result dict'''
+    from cnns.datasets import load_data
+
+    # Convert the mirror once here: the workers then only memory-map the cache
+    load_data('cifar10', mirror)
+    cluster = cluster or local_cluster(num_workers)
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+    output = os.path.join(tempfile.mkdtemp(), 'result.json')
+    workers = []
+    for index in range(num_workers):
+        command = [sys.executable, '-m', 'cnns.distributed',
+                   '--index', str(index), '--cluster', ','.join(cluster),
+                   '--epochs', str(epochs), '--batch-size', str(batch_size),
+                   '--reduction-factor', str(reduction_factor), '--seed', str(seed),
+                   '--threads', str(threads_per_worker)]
+        if mirror:
+            command += ['--mirror', mirror]
+        if index == 0:
+            command += ['--output', output]
+        workers.append(subprocess.Popen(command))
+    try:
+        codes = [worker.wait(timeout) for worker in workers]
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.kill()
+    if any(codes):
+        raise RuntimeError(f'Worker exit codes: {codes}')
+    with open(output) as f:
+        return json.load(f)
+
+
+def run_worker(index, cluster, epochs=2, batch_size=32, reduction_factor=1, mirror=None, seed=0,
+               threads=None, output=None):
+    '''Body of one worker process; TF_CONFIG must be set before TensorFlow starts'''
+    os.environ['TF_CONFIG'] = json.dumps({'cluster': {'worker': cluster},
+                                          'task': {'type': 'worker', 'index': index}})
+    if threads:
+        from cnns.reproducibility import limit_threads
+        limit_threads(threads)
+    import tensorflow as tf
+
+    from cnns.cifar import compile_model, initialize_model, load_cifar
+    from cnns.reproducibility import set_seed
+
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    # Same seed on every worker, so that they all draw the same subsample
+    set_seed(seed, deterministic=False)
+    # uint8 images, normalised per batch: a float64 copy of CIFAR is 1.2 GB per worker
+    X_train, y_train, _, _ = load_cifar(reduction_factor, mirror, normalize=False)
+    global_batch_size = batch_size * strategy.num_replicas_in_sync
+    steps_per_epoch = len(X_train) // global_batch_size
+
+    def dataset_fn(input_context):
+        dataset = tf.data.Dataset.from_tensor_slices((X_train, y_train))
+        dataset = dataset.shard(input_context.num_input_pipelines, input_context.input_pipeline_id)
+        return (dataset.shuffle(len(X_train), seed=seed)
+                       .repeat()
+                       .batch(input_context.get_per_replica_batch_size(global_batch_size), drop_remainder=True)
+                       .map(lambda X, y: (tf.cast(X, tf.float32) / 255., y), num_parallel_calls=tf.data.AUTOTUNE)
+                       .prefetch(tf.data.AUTOTUNE))
+
+    with strategy.scope():
+        model = compile_model(initialize_model())
+
+    epoch_times = []
+    timer = tf.keras.callbacks.LambdaCallback(
+        on_epoch_begin=lambda epoch, logs: epoch_times.append(time.perf_counter()),
+        on_epoch_end=lambda epoch, logs: epoch_times.__setitem__(-1, time.perf_counter() - epoch_times[-1]))
+    history = model.fit(tf.keras.utils.experimental.DatasetCreator(dataset_fn),
+                        epochs=epochs,
+                        steps_per_epoch=steps_per_epoch,
+                        callbacks=[timer],
+                        verbose=2 if index == 0 else 0)
+
+    if output is not None:
+        # The first epoch includes tracing and the collective setup
+        steady = epoch_times[1:] or epoch_times
+        epoch_time = sorted(steady)[len(steady) // 2]
+        with open(output, 'w') as f:
+            json.dump({
+                'workers': len(cluster),
+                'global_batch_size': global_batch_size,
+                'epoch_times': epoch_times,
+                'images_per_sec': steps_per_epoch * global_batch_size / epoch_time,
+                'history': {k: [float(v) for v in values] for k, values in history.history.items()},
+            }, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='One worker of the data-parallel CIFAR training')
+    parser.add_argument('--index', type=int, required=True)
+    parser.add_argument('--cluster', required=True, help='comma-separated host:port of all the workers')
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=32, help='per worker')
+    parser.add_argument('--reduction-factor', type=int, default=1)
+    parser.add_argument('--mirror')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--output', help='where the chief writes its result')
+    args = parser.parse_args(argv)
+    run_worker(args.index, args.cluster.split(','), args.epochs, args.batch_size, args.reduction_factor,
+               args.mirror, args.seed, args.threads, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+'''Inference export of the trained flowers models
+
+The models of the notebook expect their inputs to be prepared outside of
+the graph (`preprocess_input` for the transfer models), so serving them
+means replicating that step exactly. The functions below put it inside
+the graph, so the exported artifacts take the raw 0-255 RGB pixels:
+
+* `with_preprocessing` prepends the backbone's `preprocess_input`
+  (channel swap and mean subtraction for VGG16),
+* `export_saved_model` / `export_tflite` trace the model with
+  `training=False`, which drops Dropout and the other training-only ops,
+  with optional post-training int8 quantisation for TFLite.
+
+`cnns.optimize.fold_rescaling` removes the `Rescaling` layer of
+`load_own_model` before export by scaling the kernel of the first
+convolution.
+'''
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import Input, Model, layers
+
+from cnns.backbones import get_preprocess_input
+
+
+def with_preprocessing(model, backbone='vgg16'):
+    '''Model taking raw 0-255 RGB pixels, with `preprocess_input` in the graph'''
+    preprocess_input = get_preprocess_input(backbone)
+    inp = Input(model.input_shape[1:])
+    x = layers.Lambda(preprocess_input, name=f'{backbone}_preprocess')(inp)
+    return Model(inp, model(x, training=False))
+
+
+def inference_function(model):
+    '''Concrete function running `model` in inference mode on float32 batches'''
+    signature = tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32, name='pixels')
+
+    @tf.function(input_signature=[signature])
+    def serve(pixels):
+        return {'probabilities': model(pixels, training=False)}
+
+    return serve.get_concrete_function()
+
+
+def export_saved_model(model, path):
+    '''Write `model` as a SavedModel with a single inference signature'''
+    serve = inference_function(model)
+    tf.saved_model.save(model, path, signatures={'serving_default': serve})
+    return path
+
+
+def export_tflite(model, path, representative_data=None, num_calibration_batches=100):
+    '''Write `model` as a TFLite flatbuffer
+
+    With `representative_data` (an iterable of raw pixel batches) the model
+    is quantised to int8, inputs included: the served model takes uint8
+    pixels directly.
+    '''
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([inference_function(model)], model)
+    if representative_data is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        def representative_dataset():
+            for i, batch in enumerate(representative_data):
+                if i >= num_calibration_batches:
+                    break
+                for image in np.asarray(batch, dtype='float32'):
+                    yield [image[None]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.float32
+    tflite_model = converter.convert()
+    with open(path, 'wb') as f:
+        f.write(tflite_model)
+    return path
+
+
+class TFLiteModel:
+    '''Minimal `predict` around a TFLite interpreter'''
+
+    def __init__(self, path, num_threads=None):
+        self.interpreter = tf.lite.Interpreter(model_path=path, num_threads=num_threads)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+
+    def _quantize(self, X):
+        scale, zero_point = self.input['quantization']
+        if self.input['dtype'] == np.float32 or scale == 0:
+            return np.asarray(X, dtype=self.input['dtype'])
+        info = np.iinfo(self.input['dtype'])
+        return np.clip(np.round(np.asarray(X) / scale + zero_point), info.min, info.max).astype(self.input['dtype'])
+
+    def predict(self, X):
+        X = self._quantize(X)
+        if self._batch_size != len(X):
+            self.interpreter.resize_tensor_input(self.input['index'], X.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = len(X)
+        self.interpreter.set_tensor(self.input['index'], X)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output['index'])
+
+
+def load_saved_model(path):
+    '''`predict`-like function around the exported SavedModel signature'''
+    serve = tf.saved_model.load(path).signatures['serving_default']
+    return lambda X: serve(pixels=tf.constant(X, tf.float32))['probabilities'].numpy()
+
+
+def check_parity(reference, exported, X, atol=1e-4):
+    '''Compare the outputs of two `predict` functions on the same raw pixels'''
+    expected, actual = np.asarray(reference(X)), np.asarray(exported(X))
+    max_abs_diff = float(np.max(np.abs(expected - actual)))
+    return {
+        'max_abs_diff': max_abs_diff,
+        'top1_agreement': float(np.mean(expected.argmax(-1) == actual.argmax(-1))),
+        'ok': max_abs_diff <= atol,
+    }
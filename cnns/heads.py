@@ -0,0 +1,65 @@
+'''Classification heads to stack on top of a frozen convolutional base
+
+Each builder returns the list of layers that goes after the base model.
+The `flatten` head is the one from the transfer learning notebook: on a
+256x256 VGG16 it feeds a 8*8*512 = 32,768 wide vector into `Dense(500)`,
+i.e. ~16M trainable weights. The other heads reduce that count.
+'''
+
+from tensorflow.keras import layers
+
+
+def flatten_head(num_classes, units=500):
+    '''Flatten -> Dense(units) -> softmax, as in the notebook'''
+    return [
+        layers.Flatten(),
+        layers.Dense(units, activation='relu'),
+        layers.Dense(num_classes, activation='softmax')
+    ]
+
+
+def global_avg_head(num_classes, units=500):
+    '''Average each feature map to one value: 512 inputs instead of 32,768'''
+    return [
+        layers.GlobalAveragePooling2D(),
+        layers.Dense(units, activation='relu'),
+        layers.Dense(num_classes, activation='softmax')
+    ]
+
+
+def global_max_head(num_classes, units=500):
+    '''Keep the strongest activation of each feature map'''
+    return [
+        layers.GlobalMaxPooling2D(),
+        layers.Dense(units, activation='relu'),
+        layers.Dense(num_classes, activation='softmax')
+    ]
+
+
+def low_rank_head(num_classes, units=500, rank=64):
+    '''Flatten head whose first Dense is factorised as a rank-`rank` product
+
+    The (32768, 500) kernel becomes (32768, rank) @ (rank, 500), which keeps
+    the spatial information of Flatten at a fraction of the weights.
+    '''
+    return [
+        layers.Flatten(),
+        layers.Dense(rank, use_bias=False),
+        layers.Dense(units, activation='relu'),
+        layers.Dense(num_classes, activation='softmax')
+    ]
+
+
+HEADS = {
+    'flatten': flatten_head,
+    'avg': global_avg_head,
+    'max': global_max_head,
+    'low_rank': low_rank_head,
+}
+
+
+def get_head(name, num_classes, **kwargs):
+    '''Return the layers of the head registered under `name`'''
+    if name not in HEADS:
+        raise ValueError(f"Unknown head '{name}', choose among {sorted(HEADS)}")
+    return HEADS[name](num_classes, **kwargs)
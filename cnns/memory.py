@@ -0,0 +1,158 @@
+'''Peak memory of named pipeline stages
+
+When a job is OOM-killed the question is which stage peaked: the list of
+decoded images, `preprocess_input` on the full arrays, `to_categorical`,
+the autoencoder's noisy copies, the outputs of `predict`... `MemoryProfiler`
+samples the process RSS on a background thread and traces the Python/NumPy
+allocations (`tracemalloc`), and attributes both to the stages opened with
+`stage()`, which can be nested:
+
+    profiler = MemoryProfiler()
+    with profiler:
+        with profiler.stage('load'):
+            X_train, y_train, *_ = load_flowers_data()
+        with profiler.stage('preprocess'):
+            X_train = preprocess_input(X_train)
+    print_table(profiler.report())
+    profiler.write('memory.json')
+
+`compare_reports` flags the stages whose peak grew between two reports,
+and `cnns.plotting.plot_memory_timeline` draws the RSS timeline. The RSS
+is read from /proc: elsewhere the timeline is empty and the RSS columns
+are None, only `traced_peak_mb` is measured.
+'''
+
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from cnns.tracking import current_rss_mb
+
+
+class MemoryProfiler:
+    '''RSS timeline sampled every `interval` seconds, with per-stage attribution'''
+
+    def __init__(self, interval=0.01, trace_allocations=True):
+        self.interval = interval
+        self.trace_allocations = trace_allocations
+        self.samples = []  # (seconds since start, rss MB, stage path)
+        self.stages = []
+        self._stack = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        else:
+            self._started_tracing = False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name='memory-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _now(self):
+        return time.perf_counter() - self._t0
+
+    def _path(self):
+        return '/'.join(frame['stage'] for frame in self._stack)
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is None:
+            return None
+        self.samples.append((self._now(), rss, self._path()))
+        for frame in self._stack:
+            frame['peak_rss_mb'] = max(frame['peak_rss_mb'], rss)
+        return rss
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            if self._sample() is None:
+                return
+
+    def _update_traced_peak(self):
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._stack:
+            frame['traced_peak_mb'] = max(frame['traced_peak_mb'], (peak - frame['traced_start']) / 2**20)
+        if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+; before, peaks only grow over the stages
+            tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name):
+        '''Attribute the memory used inside the `with` block to `name`'''
+        self._update_traced_peak()
+        rss = self._sample()
+        frame = {'stage': name, 'start': self._now(), 'start_rss_mb': rss, 'peak_rss_mb': rss,
+                 'traced_start': tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0,
+                 'traced_peak_mb': 0.}
+        self._stack.append(frame)
+        try:
+            yield frame
+        finally:
+            self._update_traced_peak()
+            rss = self._sample()
+            path = self._path()
+            self._stack.pop()
+            start_rss = frame['start_rss_mb']
+            measured = rss is not None and start_rss is not None
+            self.stages.append({
+                'stage': path,
+                'start': frame['start'],
+                'seconds': self._now() - frame['start'],
+                'start_rss_mb': frame['start_rss_mb'],
+                'end_rss_mb': rss,
+                'retained_mb': rss - start_rss if measured else None,
+                'peak_rss_mb': frame['peak_rss_mb'],
+                'peak_increase_mb': frame['peak_rss_mb'] - start_rss if measured else None,
+                'traced_peak_mb': frame['traced_peak_mb'],
+            })
+
+    def report(self):
+        '''One row per stage, in the order the stages started'''
+        return sorted(self.stages, key=lambda row: row['start'])
+
+    def write(self, path):
+        '''Stages and RSS timeline as JSON'''
+        with open(path, 'w') as f:
+            json.dump({'stages': self.report(),
+                       'samples': [{'t': t, 'rss_mb': rss, 'stage': stage} for t, rss, stage in self.samples]},
+                      f, indent=1)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)['stages']
+
+
+def compare_reports(baseline, report, tolerance=0.1, min_mb=10.):
+    '''Stages whose peak increase grew by more than `tolerance` (and `min_mb`) over `baseline`'''
+    before = {row['stage']: row for row in baseline}
+    regressions = []
+    for row in report:
+        old = before.get(row['stage'])
+        if old is None or old['peak_increase_mb'] is None or row['peak_increase_mb'] is None:
+            continue
+        growth = row['peak_increase_mb'] - old['peak_increase_mb']
+        if growth > min_mb and growth > tolerance * max(old['peak_increase_mb'], 1.):
+            regressions.append({'stage': row['stage'], 'baseline_mb': old['peak_increase_mb'],
+                                'peak_increase_mb': row['peak_increase_mb'], 'growth_mb': growth})
+    return regressions
@@ -0,0 +1,167 @@
+'''Inference-time rewrites of the project's Sequential CNNs
+
+`optimize_for_inference` rebuilds a smaller, equivalent Sequential model:
+
+* training-only layers (Dropout and friends) are removed,
+* a `Rescaling` in front of a Conv2D/Dense is folded in its kernel,
+* a `BatchNormalization` after a linear Conv2D/Dense is folded in its
+  kernel and bias,
+* an `Activation` after a linear Conv2D/Dense becomes its activation, so
+  TensorFlow runs them as one fused kernel.
+
+`compile_inference` then traces the result for one static batch shape
+(optionally with XLA), which is what `predict` pays for at every call.
+'''
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import Input, Sequential, layers
+from tensorflow.keras.layers.experimental.preprocessing import Rescaling
+
+TRAINING_ONLY = (layers.Dropout, layers.GaussianNoise, layers.GaussianDropout,
+                 layers.AlphaDropout, layers.ActivityRegularization)
+LINEAR_LAYERS = (layers.Conv2D, layers.Dense)
+
+
+class _Spec:
+    '''A layer to rebuild: its class, config and weights'''
+
+    def __init__(self, layer):
+        self.cls = layer.__class__
+        self.config = layer.get_config()
+        self.config.pop('batch_input_shape', None)
+        self.weights = layer.get_weights()
+        self.rank = len(layer.output_shape)
+
+    @property
+    def is_linear(self):
+        return issubclass(self.cls, LINEAR_LAYERS) and self.config.get('activation') == 'linear'
+
+    def kernel_and_bias(self):
+        kernel = self.weights[0]
+        bias = self.weights[1] if self.config.get('use_bias', True) else np.zeros(kernel.shape[-1], kernel.dtype)
+        return kernel, bias
+
+    def set_kernel_and_bias(self, kernel, bias):
+        self.config['use_bias'] = True
+        self.weights = [kernel, bias.astype(kernel.dtype)]
+
+    def build(self):
+        return self.cls.from_config(self.config)
+
+
+def _fold_rescaling(rescaling, spec):
+    '''Fold x * scale + offset into the next Conv2D/Dense, or return False'''
+    if not issubclass(spec.cls, LINEAR_LAYERS):
+        return False
+    scale, offset = rescaling.config['scale'], rescaling.config['offset']
+    if np.ndim(scale) or np.ndim(offset):
+        return False
+    kernel, bias = spec.kernel_and_bias()
+    if offset:
+        # With zero padding the borders would see `offset` instead of 0
+        if issubclass(spec.cls, layers.Conv2D) and spec.config['padding'] != 'valid':
+            return False
+        bias = bias + offset * kernel.reshape(-1, kernel.shape[-1]).sum(axis=0)
+    spec.set_kernel_and_bias(kernel * scale, bias)
+    return True
+
+
+def _fold_batch_norm(spec, bn):
+    '''Fold an inference-mode BatchNormalization into the linear layer before it'''
+    axis = np.ravel(bn.config['axis'])
+    if not spec.is_linear or len(axis) != 1 or axis[0] not in (-1, spec.rank - 1):
+        return False
+    weights = list(bn.weights)
+    gamma = weights.pop(0) if bn.config['scale'] else 1.
+    beta = weights.pop(0) if bn.config['center'] else 0.
+    mean, variance = weights
+    factor = gamma / np.sqrt(variance + bn.config['epsilon'])
+    kernel, bias = spec.kernel_and_bias()
+    spec.set_kernel_and_bias(kernel * factor, (bias - mean) * factor + beta)
+    return True
+
+
+def optimize_for_inference(model):
+    '''Equivalent Sequential model with the rewrites of this module applied'''
+    if not isinstance(model, Sequential):
+        raise ValueError('Only Sequential models can be optimised')
+
+    specs = []
+    pending_rescaling = None
+    for layer in model.layers:
+        if isinstance(layer, TRAINING_ONLY):
+            continue
+        spec = _Spec(layer)
+        if isinstance(layer, Rescaling):
+            if pending_rescaling is not None:
+                specs.append(pending_rescaling)
+            pending_rescaling = spec
+            continue
+        if pending_rescaling is not None:
+            if not _fold_rescaling(pending_rescaling, spec):
+                specs.append(pending_rescaling)
+            pending_rescaling = None
+        if specs and isinstance(layer, layers.BatchNormalization) and _fold_batch_norm(specs[-1], spec):
+            continue
+        if specs and isinstance(layer, layers.Activation) and specs[-1].is_linear:
+            specs[-1].config['activation'] = spec.config['activation']
+            continue
+        specs.append(spec)
+    if pending_rescaling is not None:
+        specs.append(pending_rescaling)
+
+    optimized = Sequential([Input(model.input_shape[1:])] + [spec.build() for spec in specs],
+                           name=f'{model.name}_inference')
+    for layer, spec in zip(optimized.layers, specs):
+        layer.set_weights(spec.weights)
+    return optimized
+
+
+def fold_rescaling(model):
+    '''Copy of a Sequential model whose leading `Rescaling` is folded in the first Conv2D
+
+    The other rewrites of `optimize_for_inference` are applied too.
+    '''
+    if not isinstance(model.layers[0], Rescaling):
+        raise ValueError('Expected a Sequential model starting with Rescaling')
+    optimized = optimize_for_inference(model)
+    if any(isinstance(layer, Rescaling) for layer in optimized.layers):
+        raise ValueError('The Rescaling could not be folded in the next layer')
+    return optimized
+
+
+class StaticPredictor:
+    '''`predict` through one concrete function traced for a fixed batch shape
+
+    Inputs are cut into `batch_size` chunks and the last one is padded, so
+    the function is never retraced.
+    '''
+
+    def __init__(self, model, batch_size=32, jit_compile=False):
+        self.batch_size = batch_size
+        self.input_shape = tuple(model.input_shape[1:])
+        spec = tf.TensorSpec((batch_size,) + self.input_shape, tf.float32)
+        self.function = tf.function(lambda x: model(x, training=False),
+                                    jit_compile=jit_compile).get_concrete_function(spec)
+
+    def __call__(self, X):
+        return self.predict(X)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype='float32')
+        outputs = []
+        for start in range(0, len(X), self.batch_size):
+            batch = X[start:start + self.batch_size]
+            n = len(batch)
+            if n < self.batch_size:
+                batch = np.concatenate([batch, np.zeros((self.batch_size - n,) + self.input_shape, 'float32')])
+            outputs.append(self.function(tf.constant(batch)).numpy()[:n])
+        return np.concatenate(outputs)
+
+
+def compile_inference(model, batch_size=32, jit_compile=False, optimize=True):
+    '''`StaticPredictor` of the (optimised) model'''
+    if optimize:
+        model = optimize_for_inference(model)
+    return StaticPredictor(model, batch_size, jit_compile)
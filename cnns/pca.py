@@ -0,0 +1,100 @@
+'''Incremental PCA: the linear baseline of the MNIST autoencoder
+
+`IncrementalPCA` is fitted chunk by chunk (arrays, memory maps or any
+iterable of batches): only the running sum and scatter matrix of the
+flattened images are kept, 784x784 for MNIST, whatever the number of
+images. The fitted projection is then wrapped in Keras models with the
+interface of `build_encoder`/`build_decoder`, so it drops into
+`build_autoencoder` and the elbow-plot loop of the notebook:
+
+    pca = IncrementalPCA().fit(X_train, chunk_size=10000)
+    encoder, decoder = build_pca_encoder(pca, 8), build_pca_decoder(pca, 8)
+    X_encoded = encoder.predict(X_test)
+    reconstruction = build_autoencoder(encoder, decoder).predict(X_test)
+
+One fit serves every latent dimension.
+'''
+
+import numpy as np
+from tensorflow.keras import Sequential
+from tensorflow.keras.layers import Dense, Flatten, Reshape
+
+
+class IncrementalPCA:
+    '''Principal components from running first and second moments'''
+
+    def __init__(self):
+        self.n = 0
+        self.input_shape = None
+        self._sum = None
+        self._scatter = None
+        self._components = None
+
+    def partial_fit(self, X):
+        '''Add the chunk `X` (n, ...) to the moments'''
+        X = np.asarray(X, dtype='float64')
+        if self.input_shape is None:
+            self.input_shape = X.shape[1:]
+            dimension = int(np.prod(self.input_shape))
+            self._sum = np.zeros(dimension)
+            self._scatter = np.zeros((dimension, dimension))
+        X = X.reshape(len(X), -1)
+        self.n += len(X)
+        self._sum += X.sum(axis=0)
+        self._scatter += X.T @ X
+        self._components = None
+        return self
+
+    def fit(self, X, chunk_size=10000):
+        '''Fit on an array in chunks of `chunk_size`, or on an iterable of chunks'''
+        chunks = (X[i:i + chunk_size] for i in range(0, len(X), chunk_size)) if hasattr(X, 'shape') else X
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    @property
+    def mean(self):
+        return self._sum / self.n
+
+    def _eigen(self):
+        if self._components is None:
+            covariance = self._scatter / self.n - np.outer(self.mean, self.mean)
+            variances, vectors = np.linalg.eigh(covariance)
+            order = np.argsort(variances)[::-1]
+            self._variances, self._components = np.maximum(variances[order], 0.), vectors[:, order].T
+        return self._variances, self._components
+
+    def components(self, latent_dimension):
+        '''(latent_dimension, features) principal axes, by decreasing variance'''
+        return self._eigen()[1][:latent_dimension]
+
+    def explained_variance_ratio(self, latent_dimension):
+        variances = self._eigen()[0]
+        return float(variances[:latent_dimension].sum() / variances.sum())
+
+    def encode(self, X, latent_dimension):
+        X = np.asarray(X, dtype='float64').reshape(len(X), -1)
+        return (X - self.mean) @ self.components(latent_dimension).T
+
+    def decode(self, Z, latent_dimension):
+        X = np.asarray(Z) @ self.components(latent_dimension) + self.mean
+        return X.reshape((len(X),) + self.input_shape)
+
+
+def build_pca_encoder(pca, latent_dimension):
+    '''Keras encoder projecting on the first `latent_dimension` components'''
+    components = pca.components(latent_dimension)
+    encoder = Sequential()
+    encoder.add(Flatten(input_shape=pca.input_shape))
+    encoder.add(Dense(latent_dimension))
+    encoder.layers[-1].set_weights([components.T, -pca.mean @ components.T])
+    return encoder
+
+
+def build_pca_decoder(pca, latent_dimension):
+    '''Keras decoder mapping the `latent_dimension` coordinates back to images'''
+    decoder = Sequential()
+    decoder.add(Dense(int(np.prod(pca.input_shape)), input_shape=(latent_dimension,)))
+    decoder.add(Reshape(pca.input_shape))
+    decoder.layers[0].set_weights([pca.components(latent_dimension), pca.mean])
+    return decoder
@@ -0,0 +1,64 @@
+'''Training curves, shared by the CIFAR and transfer learning notebooks'''
+
+import matplotlib.pyplot as plt
+
+
+def plot_history(history, title='', axs=None, exp_name=""):
+    '''Loss and accuracy curves of a `History`, or of a `{metric: values}` dict'''
+    history = getattr(history, 'history', history)
+    if axs is not None:
+        ax1, ax2 = axs
+    else:
+        f, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
+
+    if len(exp_name) > 0 and exp_name[0] != '_':
+        exp_name = '_' + exp_name
+    ax1.plot(history['loss'], label='train' + exp_name)
+    ax1.plot(history['val_loss'], label='val' + exp_name)
+    ax1.set_title('loss')
+    ax1.legend()
+
+    ax2.plot(history['accuracy'], label='train accuracy' + exp_name)
+    ax2.plot(history['val_accuracy'], label='val accuracy' + exp_name)
+    ax2.set_title('Accuracy')
+    ax2.legend()
+    if title:
+        ax1.figure.suptitle(title)
+    return (ax1, ax2)
+
+
+def plot_runs(tracker, run_ids=None, metric=None):
+    '''Overlay tracked runs: `plot_history` curves, or a single `metric` per epoch'''
+    runs = {run['run_id']: run for run in tracker.runs()}
+    run_ids = run_ids or list(runs)
+    if metric is None:
+        axs = None
+        for run_id in run_ids:
+            axs = plot_history(tracker.history(run_id), axs=axs, exp_name=f"{runs[run_id]['name']}#{run_id}")
+        return axs
+
+    _, ax = plt.subplots(figsize=(6, 4))
+    for run_id in run_ids:
+        ax.plot(tracker.history(run_id).get(metric, []), label=f"{runs[run_id]['name']}#{run_id}")
+    ax.set_title(metric)
+    ax.set_xlabel('epoch')
+    ax.legend()
+    return ax
+
+
+def plot_memory_timeline(profiler, ax=None):
+    '''RSS over time of a `MemoryProfiler`, with its top-level stages shaded'''
+    if ax is None:
+        _, ax = plt.subplots(figsize=(10, 4))
+    if profiler.samples:  # empty where the RSS cannot be read
+        times, rss, _ = zip(*profiler.samples)
+        ax.plot(times, rss, color='black')
+    for i, stage in enumerate(row for row in profiler.report() if '/' not in row['stage']):
+        increase = stage['peak_increase_mb']
+        label = stage['stage'] if increase is None else f"{stage['stage']} (+{increase:.0f} MB)"
+        ax.axvspan(stage['start'], stage['start'] + stage['seconds'], alpha=0.2, color=f'C{i % 10}',
+                   label=label)
+    ax.set_xlabel('seconds')
+    ax.set_ylabel('RSS (MB)')
+    ax.legend()
+    return ax
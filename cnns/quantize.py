@@ -0,0 +1,82 @@
+'''Post-training int8 quantisation of the CIFAR and flowers classifiers
+
+The activation ranges are calibrated on random batches of the training
+data, then `quantization_report` measures what the int8 model costs in
+test accuracy and what it saves in size and CPU latency, so that we can
+decide per model whether to ship it:
+
+    X_train, y_train, X_test, y_test = load_cifar()
+    report = quantization_report(model, X_train, X_test, y_test, 'cifar_int8.tflite')
+
+For the transfer models pass the `backbone`: its `preprocess_input` is
+folded into the exported graph and the model takes raw pixels.
+'''
+
+import os
+import tempfile
+
+import numpy as np
+
+from cnns.export import TFLiteModel, export_tflite, with_preprocessing
+from cnns.optimize import optimize_for_inference
+from cnns.reproducibility import numpy_rng
+from cnns.timing import time_call
+
+
+def calibration_batches(X, batch_size=32, num_batches=100, rng=None):
+    '''Random batches of `X` (array, memory map or `ImageSequence`) for calibration'''
+    rng = numpy_rng(rng)
+    if hasattr(X, '__getitem__') and hasattr(X, 'on_epoch_end'):  # Keras Sequence
+        for i in rng.permutation(len(X))[:num_batches]:
+            yield X[int(i)][0]
+        return
+    for _ in range(num_batches):
+        idx = np.sort(rng.choice(len(X), min(batch_size, len(X)), replace=False))
+        yield X[idx]
+
+
+def quantize(model, calibration_data, path, backbone=None, num_calibration_batches=100):
+    '''Write the int8 TFLite version of `model` to `path`
+
+    `calibration_data` is an array (or Sequence) of training inputs, raw
+    pixels when `backbone` is given.
+    '''
+    served = _served_model(model, backbone)
+    batches = calibration_batches(calibration_data, num_batches=num_calibration_batches)
+    return export_tflite(served, path, batches, num_calibration_batches)
+
+
+def _served_model(model, backbone):
+    if backbone is not None:
+        return with_preprocessing(model, backbone)
+    try:
+        return optimize_for_inference(model)
+    except ValueError:
+        return model
+
+
+def quantization_report(model, X_train, X_test, y_test, path=None, backbone=None,
+                        num_calibration_batches=100, batch_size=32):
+    '''Accuracy, size and latency of the float32 and int8 TFLite models'''
+    export_dir = tempfile.mkdtemp()
+    path = path or os.path.join(export_dir, 'model_int8.tflite')
+    float_path = export_tflite(_served_model(model, backbone), os.path.join(export_dir, 'model_float.tflite'))
+    quantize(model, X_train, path, backbone, num_calibration_batches)
+
+    y_true = np.asarray(y_test).argmax(-1)
+    batch = np.asarray(X_test[:batch_size], dtype='float32')
+    report = {}
+    for variant, tflite_path in (('float32', float_path), ('int8', path)):
+        interpreter = TFLiteModel(tflite_path)
+        predictions = np.concatenate([interpreter.predict(np.asarray(X_test[i:i + batch_size], dtype='float32'))
+                                      for i in range(0, len(X_test), batch_size)])
+        report[variant] = {
+            'accuracy': float(np.mean(predictions.argmax(-1) == y_true)),
+            'size_mb': os.path.getsize(tflite_path) / 2**20,
+            'latency_ms_per_img': time_call(lambda: interpreter.predict(batch), repeats=10) * 1000 / len(batch),
+        }
+    report['accuracy_drop'] = report['float32']['accuracy'] - report['int8']['accuracy']
+    report['size_ratio'] = report['int8']['size_mb'] / report['float32']['size_mb']
+    report['speedup'] = report['float32']['latency_ms_per_img'] / report['int8']['latency_ms_per_img']
+    report['path'] = path
+    return report
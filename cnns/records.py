@@ -0,0 +1,148 @@
+'''Sharded, compressed record files for CIFAR and flowers
+
+CIFAR lives in memory as NumPy arrays, and flowers as loose JPEGs that are
+decoded one file at a time. `write_records` packs either source into
+`num_shards` GZIP-compressed TFRecord files plus an `index.json` (shard
+files, record counts, image shape, class counts). `read_records` streams
+them back as a `tf.data.Dataset`: the shards are read in parallel and
+interleaved, their order is reshuffled every epoch and the batches go
+straight into `fit`:
+
+    write_cifar('records/cifar')
+    train = read_records('records/cifar/train', batch_size=32, preprocess=lambda X: X / 255.)
+    model.fit(train, epochs=20)
+
+The images are stored as raw uint8 pixels, so reading back gives exactly
+the arrays of `load_cifar` and `ImageFolder.load`.
+'''
+
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from cnns.data import ImageFolder, split_indices
+from cnns.reproducibility import numpy_rng
+
+INDEX = 'index.json'
+
+
+def _example(image, label):
+    return tf.train.Example(features=tf.train.Features(feature={
+        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.tobytes()])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+    })).SerializeToString()
+
+
+def write_records(path, images, labels, num_shards=8, num_classes=None, compression='GZIP',
+                  shuffle=True, batch_size=64, rng=None):
+    '''Pack `images` (uint8 array or `ImageFolder`) and integer `labels` into shards
+
+    The records are shuffled across shards (when `shuffle`), so that
+    reading any shard gives a mix of classes. An `ImageFolder` is decoded
+    `batch_size` images at a time.
+    '''
+    labels = np.asarray(labels).reshape(-1)
+    order = numpy_rng(rng).permutation(len(labels)) if shuffle else np.arange(len(labels))
+    num_shards = min(num_shards, len(labels))
+    options = tf.io.TFRecordOptions(compression_type=compression)
+    os.makedirs(path, exist_ok=True)
+
+    shards, shape = [], None
+    for shard, indices in enumerate(np.array_split(order, num_shards)):
+        name = f'shard-{shard:05d}-of-{num_shards:05d}.tfrecord'
+        with tf.io.TFRecordWriter(os.path.join(path, name), options) as writer:
+            for start in range(0, len(indices), batch_size):
+                batch = np.sort(indices[start:start + batch_size])
+                X = images.load(batch) if isinstance(images, ImageFolder) else np.asarray(images[batch])
+                shape = X.shape[1:]
+                for image, label in zip(X, labels[batch]):
+                    writer.write(_example(np.ascontiguousarray(image, dtype='uint8'), label))
+        shards.append({'file': name, 'count': len(indices)})
+
+    num_classes = num_classes or int(labels.max()) + 1
+    index = {
+        'shards': shards,
+        'count': len(labels),
+        'shape': list(shape),
+        'num_classes': num_classes,
+        'class_counts': np.bincount(labels, minlength=num_classes).tolist(),
+        'compression': compression,
+    }
+    with open(os.path.join(path, INDEX), 'w') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def read_index(path):
+    with open(os.path.join(path, INDEX)) as f:
+        return json.load(f)
+
+
+def read_records(path, batch_size=32, shuffle=True, shuffle_buffer=1024, one_hot=True, preprocess=None,
+                 cycle_length=None, drop_remainder=False, seed=None):
+    '''`tf.data.Dataset` of (float32 images, labels) batches read from the shards at `path`
+
+    Shards are interleaved `cycle_length` at a time (default: up to 8) by
+    parallel readers; with `shuffle` the shard order changes every epoch
+    and a `shuffle_buffer` mixes the records further. `preprocess` is
+    applied to each batch of images.
+    '''
+    index = read_index(path)
+    shape, num_classes = index['shape'], index['num_classes']
+    files = [os.path.join(path, shard['file']) for shard in index['shards']]
+    features = {'image': tf.io.FixedLenFeature([], tf.string), 'label': tf.io.FixedLenFeature([], tf.int64)}
+
+    def parse(records):
+        parsed = tf.io.parse_example(records, features)
+        images = tf.reshape(tf.io.decode_raw(parsed['image'], tf.uint8), [-1] + shape)
+        images = tf.cast(images, tf.float32)
+        if preprocess is not None:
+            images = preprocess(images)
+        labels = tf.one_hot(parsed['label'], num_classes) if one_hot else parsed['label']
+        return images, labels
+
+    dataset = tf.data.Dataset.from_tensor_slices(files)
+    if shuffle:
+        dataset = dataset.shuffle(len(files), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.interleave(lambda f: tf.data.TFRecordDataset(f, compression_type=index['compression']),
+                                 cycle_length=cycle_length or min(len(files), 8),
+                                 num_parallel_calls=tf.data.AUTOTUNE,
+                                 deterministic=not shuffle)
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return (dataset.batch(batch_size, drop_remainder=drop_remainder)
+                   .map(parse, num_parallel_calls=tf.data.AUTOTUNE)
+                   .prefetch(tf.data.AUTOTUNE))
+
+
+def write_cifar(path, mirror=None, num_shards=16, **kwargs):
+    '''CIFAR-10 train and test sets as shards in `path/train` and `path/test`'''
+    from cnns.datasets import load_data
+    (x_train, y_train), (x_test, y_test) = load_data('cifar10', mirror)
+    return {'train': write_records(os.path.join(path, 'train'), x_train, y_train, num_shards, 10, **kwargs),
+            'test': write_records(os.path.join(path, 'test'), x_test, y_test, max(1, num_shards // 4), 10,
+                                  **kwargs)}
+
+
+def write_flowers(path, data_path=None, mirror=None, num_shards=8, rng=None, **kwargs):
+    '''Flowers train/val/test splits (ratios of `load_flowers_data`) as shards under `path`
+
+    The images are decoded from the loose files of `data_path` (default:
+    the mirror's flowers directory) and never held in memory all at once.
+    '''
+    from cnns.datasets import FLOWERS_CLASSES, FLOWERS_IMAGE_SIZE, flowers_dir
+    folder = ImageFolder(data_path or flowers_dir(mirror), FLOWERS_CLASSES, FLOWERS_IMAGE_SIZE)
+    splits = dict(zip(('train', 'val', 'test'), split_indices(len(folder), rng=rng)))
+    return {name: write_records(os.path.join(path, name), _Subset(folder, indices), folder.labels[indices],
+                                num_shards, folder.num_classes, **kwargs)
+            for name, indices in splits.items()}
+
+
+class _Subset(ImageFolder):
+    '''View of `folder` restricted to `indices`, without re-listing the directory'''
+
+    def __init__(self, folder, indices):
+        self.__dict__.update(folder.__dict__)
+        self.paths, self.labels = folder.paths[indices], folder.labels[indices]
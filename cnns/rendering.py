@@ -0,0 +1,133 @@
+'''Images rendered directly with NumPy and written as PNG, without matplotlib
+
+`plt.scatter` on the whole encoded MNIST (60k points, millions in
+production) is slow and unreadable, which is why the notebook only plots
+`X_encoded[:300]`. `render_latent_density` bins every point into a 2-D
+histogram per label in a single `np.bincount`, blends the label colours
+weighted by their counts and shades each pixel by the log of its density:
+
+    X_encoded = encoder.predict(X_train)
+    render_latent_density(X_encoded, labels_train, 'latent.png')
+
+`montage` replaces the loops that open one figure per image: N images (or
+several aligned groups, e.g. original/noisy/reconstructed side by side)
+are tiled into one canvas by a single reshape/transpose:
+
+    montage([X_test[:100], X_noisy[:100], reconstructions[:100]], columns=5, path='denoising.png')
+'''
+
+import numpy as np
+from PIL import Image
+
+# matplotlib's 'tab10' palette, so the colours match the notebook scatter plots
+PALETTE = np.array([
+    (31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40), (148, 103, 189),
+    (140, 86, 75), (227, 119, 194), (127, 127, 127), (188, 189, 34), (23, 190, 207),
+], dtype='float64') / 255.
+
+
+def _bounds(Z, padding=0.02):
+    low, high = Z.min(axis=0), Z.max(axis=0)
+    span = np.where(high > low, high - low, 1.)
+    return low - padding * span, high + padding * span
+
+
+def latent_histograms(Z, labels=None, size=(512, 512), bounds=None, num_classes=None):
+    '''(num_classes, height, width) counts of the 2-D points `Z` per label'''
+    Z = np.asarray(Z, dtype='float64')
+    labels = np.zeros(len(Z), dtype='int64') if labels is None else np.asarray(labels).reshape(-1).astype('int64')
+    num_classes = num_classes or int(labels.max()) + 1
+    height, width = size
+    low, high = (np.asarray(b, dtype='float64') for b in bounds) if bounds is not None else _bounds(Z)
+    scaled = (Z - low) / (high - low)
+    inside = np.all((scaled >= 0) & (scaled < 1), axis=1)
+    column = (scaled[inside, 0] * width).astype('int64')
+    row = height - 1 - (scaled[inside, 1] * height).astype('int64')  # y axis pointing up
+    flat = (labels[inside] * height + row) * width + column
+    return np.bincount(flat, minlength=num_classes * height * width).reshape(num_classes, height, width)
+
+
+def composite(histograms, colors=None, background='white'):
+    '''uint8 RGB image: count-weighted mean colour per pixel, shaded by log density'''
+    colors = PALETTE[np.arange(len(histograms)) % len(PALETTE)] if colors is None else np.asarray(colors)
+    total = histograms.sum(axis=0)
+    mixed = np.einsum('lhw,lc->hwc', histograms, colors) / np.maximum(total, 1)[..., None]
+    alpha = (np.log1p(total) / np.log1p(max(total.max(), 1)))[..., None]
+    if background == 'white':
+        image = 1 - alpha * (1 - mixed)
+    else:
+        image = alpha * mixed
+    return (image * 255).round().astype('uint8')
+
+
+def render_latent_density(Z, labels=None, path=None, size=(512, 512), bounds=None, colors=None,
+                          background='white'):
+    '''Density image of the 2-D latent points `Z` coloured by `labels`, written to `path` if given'''
+    image = composite(latent_histograms(Z, labels, size, bounds), colors, background)
+    if path is not None:
+        Image.fromarray(image).save(path)
+    return image
+
+
+def _unit_range(images):
+    return images.dtype != np.uint8 and (images.size == 0 or float(np.max(images)) <= 1.)
+
+
+def to_uint8(images, unit_range=None):
+    '''(n, height, width, 3) uint8 copy of grayscale or RGB images in [0, 1] or [0, 255]
+
+    `unit_range` says whether float images are in [0, 1]; by default it is
+    guessed from their maximum.
+    '''
+    images = np.asarray(images)
+    if images.ndim == 3:
+        images = images[..., None]
+    if images.dtype != np.uint8:
+        if unit_range is None:
+            unit_range = _unit_range(images)
+        images = images.astype('float32')
+        if unit_range:
+            images = images * 255
+        images = np.clip(images, 0, 255).round().astype('uint8')
+    return np.broadcast_to(images, images.shape[:3] + (3,)) if images.shape[-1] == 1 else images
+
+
+def montage(images, columns=None, padding=2, scale=1, background=255, path=None):
+    '''Tile `images` into one uint8 RGB canvas, written to `path` if given
+
+    `images` is an array of n images, or a list of aligned arrays of n
+    images each, shown side by side per sample (one group of tiles per
+    sample, `columns` samples per row). Grayscale and float images are
+    converted, all groups with the range of the first one (reconstructions
+    slightly above 1 stay on the originals' scale); `scale` enlarges the
+    tiles (nearest neighbour).
+    '''
+    groups = [np.asarray(group) for group in ([images] if hasattr(images, 'shape') else images)]
+    unit_range = _unit_range(groups[0])
+    tiles = np.stack([to_uint8(group, unit_range) for group in groups], axis=1)  # (n, groups, height, width, 3)
+    n, num_groups = tiles.shape[:2]
+    if scale > 1:
+        tiles = tiles.repeat(scale, axis=2).repeat(scale, axis=3)
+    columns = columns or int(np.ceil(np.sqrt(n)))
+    rows = int(np.ceil(n / columns))
+
+    tiles = np.pad(tiles, ((0, rows * columns - n), (0, 0), (padding, 0), (padding, 0), (0, 0)),
+                   constant_values=background)
+    height, width = tiles.shape[2:4]
+    canvas = (tiles.reshape(rows, columns * num_groups, height, width, 3)
+                   .transpose(0, 2, 1, 3, 4)
+                   .reshape(rows * height, columns * num_groups * width, 3))
+    canvas = np.pad(canvas, ((0, padding), (0, padding), (0, 0)), constant_values=background)
+    if path is not None:
+        Image.fromarray(canvas).save(path)
+    return canvas
+
+
+def write_montages(images, path_pattern, per_page=400, **kwargs):
+    '''Montages of `per_page` samples each, written to `path_pattern.format(page)`'''
+    groups = [images] if hasattr(images, 'shape') else list(images)
+    paths = []
+    for page, start in enumerate(range(0, len(groups[0]), per_page)):
+        paths.append(path_pattern.format(page))
+        montage([group[start:start + per_page] for group in groups], path=paths[-1], **kwargs)
+    return paths
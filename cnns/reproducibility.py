@@ -0,0 +1,81 @@
+'''Seed-controlled reproducibility mode
+
+The notebooks draw from unseeded generators (the CIFAR subsampling, the
+flowers shuffle, the autoencoder noise, `ImageDataGenerator` transforms,
+Keras weight initialisation), so two runs never train the same model.
+`set_seed` seeds Python, NumPy (legacy global state, which all of those
+use) and TensorFlow, and optionally makes TensorFlow ops deterministic:
+
+    from cnns.reproducibility import set_seed
+    set_seed(42)
+
+The seed then shows up in `run_metadata()`, which the experiment tracker
+stores with every run.
+'''
+
+import os
+import random
+
+import numpy as np
+
+_STATE = {'seed': None, 'deterministic': False}
+
+
+def set_seed(seed, deterministic=True):
+    '''Seed every RNG; with `deterministic`, also force deterministic TF kernels
+
+    Deterministic kernels can be slower (see `cnns.benchmarks.determinism`)
+    and some ops have no deterministic implementation and will raise.
+    Op determinism cannot be switched off again in the same process.
+    '''
+    import tensorflow as tf
+
+    os.environ['PYTHONHASHSEED'] = str(seed)
+    random.seed(seed)
+    np.random.seed(seed)
+    tf.random.set_seed(seed)
+    if deterministic:
+        tf.config.experimental.enable_op_determinism()
+    _STATE.update(seed=seed, deterministic=deterministic or _STATE['deterministic'])
+
+
+def current_seed():
+    return _STATE['seed']
+
+
+def numpy_rng(rng=None):
+    '''`rng`, or a new Generator drawn from the global NumPy state
+
+    Deriving the Generator from `np.random` means `set_seed` also fixes the
+    code that uses the new-style `np.random.default_rng` API.
+    '''
+    if rng is not None:
+        return rng
+    return np.random.default_rng(np.random.randint(2**31))
+
+
+def limit_threads(threads):
+    '''Cap this process at `threads` intra-op threads (and one inter-op thread)
+
+    Used by processes that share the CPU with others (search trials,
+    training workers). Must run before TensorFlow initialises its thread
+    pools in this process.
+    '''
+    for var in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+        os.environ[var] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def run_metadata():
+    '''What is needed to rerun a training the same way'''
+    import tensorflow as tf
+
+    return {
+        'seed': _STATE['seed'],
+        'deterministic': _STATE['deterministic'],
+        'tensorflow': tf.__version__,
+        'numpy': np.__version__,
+    }
@@ -0,0 +1,111 @@
+'''Class-balanced (or custom-weighted) batches drawn on the fly
+
+The notebooks control class balance by building copies: a random
+`reduction_factor` subsample of CIFAR, the first 300 images of each flower
+class. `ClassSampler` instead keeps one index array per class and draws
+(class, then image within the class) with Walker's alias method, in O(1)
+per draw and without resampled copies of the data:
+
+    sampler = ClassSampler(folder.labels[train])              # equal class frequencies
+    sampler = ClassSampler(y_train, weights=[1, 1, 2, ...])   # or any class weights
+    model.fit(BalancedSequence(folder, sampler, batch_size=16, steps=100), ...)
+
+`BalancedSequence` works with the CIFAR arrays (or memory maps) and with
+an `ImageFolder`, whose images are decoded batch by batch.
+'''
+
+import numpy as np
+from tensorflow.keras.utils import Sequence
+
+from cnns.data import ImageFolder
+from cnns.reproducibility import numpy_rng
+
+
+def alias_table(weights):
+    '''Probability and alias arrays of Walker's method for the distribution `weights`'''
+    weights = np.asarray(weights, dtype='float64')
+    n = len(weights)
+    scaled = weights * n / weights.sum()
+    probability, alias = np.ones(n), np.arange(n)
+    small = [i for i in range(n) if scaled[i] < 1]
+    large = [i for i in range(n) if scaled[i] >= 1]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        probability[s], alias[s] = scaled[s], l
+        scaled[l] -= 1 - scaled[s]
+        (small if scaled[l] < 1 else large).append(l)
+    return probability, alias
+
+
+class ClassSampler:
+    '''Draw sample indices with class frequencies given by `weights`
+
+    `labels` are integer (or one-hot) labels; `indices` optionally restricts
+    the draws to a subset (e.g. the training split) and defaults to all.
+    `weights` is one weight per class, 'balanced' (equal frequencies) or
+    None (the frequencies of `labels`). Classes absent from the subset are
+    never drawn.
+    '''
+
+    def __init__(self, labels, weights='balanced', indices=None, num_classes=None, rng=None):
+        labels = np.asarray(labels)
+        labels = labels.argmax(-1) if labels.ndim == 2 and labels.shape[1] > 1 else labels.reshape(-1)
+        indices = np.arange(len(labels)) if indices is None else np.asarray(indices)
+        self.num_classes = num_classes or int(labels.max()) + 1
+        order = indices[np.argsort(labels[indices], kind='stable')]
+        counts = np.bincount(labels[indices], minlength=self.num_classes)
+        # Indices of class c are order[starts[c]:starts[c] + counts[c]]
+        self.order, self.counts, self.starts = order, counts, np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        if weights is None:
+            weights = counts
+        elif isinstance(weights, str) and weights == 'balanced':
+            weights = np.ones(self.num_classes)
+        weights = np.where(counts > 0, np.asarray(weights, dtype='float64'), 0.)
+        if weights.sum() <= 0:
+            raise ValueError('No class with a positive weight has samples')
+        self.class_probabilities = weights / weights.sum()
+        self.probability, self.alias = alias_table(self.class_probabilities)
+        self.rng = numpy_rng(rng)
+
+    def sample(self, n):
+        '''`n` sample indices (with replacement), vectorised'''
+        columns = self.rng.integers(0, self.num_classes, n)
+        classes = np.where(self.rng.random(n) < self.probability[columns], columns, self.alias[columns])
+        offsets = (self.rng.random(n) * self.counts[classes]).astype('int64')
+        return self.order[self.starts[classes] + offsets]
+
+
+class BalancedSequence(Sequence):
+    '''Keras `Sequence` of `steps` (images, one-hot labels) batches drawn by `sampler`
+
+    `data` is an `ImageFolder` or an (X, y) pair of arrays; `preprocess` is
+    applied per batch as in `ImageSequence`. An epoch is `steps` batches,
+    by default as many images as `sampler` can draw from.
+    '''
+
+    def __init__(self, data, sampler, batch_size=32, steps=None, preprocess=None, **kwargs):
+        super().__init__(**kwargs)
+        self.data = data
+        self.sampler = sampler
+        self.batch_size = batch_size
+        self.steps = steps or int(np.ceil(sampler.counts.sum() / batch_size))
+        self.preprocess = preprocess
+
+    def __len__(self):
+        return self.steps
+
+    def __getitem__(self, batch):
+        # Sorted indices read memory maps and directories in order
+        indices = np.sort(self.sampler.sample(self.batch_size))
+        if isinstance(self.data, ImageFolder):
+            X, labels = self.data.load(indices), self.data.labels[indices]
+        else:
+            X, y = self.data
+            X, labels = X[indices], np.asarray(y)[indices]
+            if labels.ndim == 2 and labels.shape[1] > 1:
+                labels = labels.argmax(-1)
+        if self.preprocess is not None:
+            X = self.preprocess(X)
+        y = np.eye(self.sampler.num_classes, dtype='float32')[labels.reshape(-1)]
+        return X, y
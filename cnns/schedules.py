@@ -0,0 +1,132 @@
+'''Learning-rate range test and one-cycle schedule
+
+`compile_model` uses Adam's default rate and the flowers models hard-code
+1e-4, so full-dataset runs spend many epochs before `EarlyStopping`.
+`lr_range_test` trains a copy of the model for a few hundred steps while
+raising the rate exponentially, and suggests a rate a decade below the
+one of the lowest loss; `OneCycle` then warms up to that rate and anneals
+it with a cosine over the run:
+
+    test = lr_range_test(model, X_train, y_train)
+    model.fit(X_train, y_train, epochs=10, callbacks=[OneCycle(test['suggested_lr'])])
+
+`OneCycle(max_lr, warmup_fraction=0)` is plain cosine annealing.
+'''
+
+import math
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+
+
+def _set_learning_rate(model, lr):
+    model.optimizer.learning_rate.assign(lr)
+
+
+class _RangeSweep(Callback):
+    def __init__(self, min_lr, max_lr, steps, smoothing, divergence):
+        super().__init__()
+        self.factor = (max_lr / min_lr) ** (1 / max(1, steps - 1))
+        self.lr, self.steps = min_lr, steps
+        self.smoothing, self.divergence = smoothing, divergence
+        self.lrs, self.losses, self._average, self._best = [], [], 0., np.inf
+
+    def on_train_batch_begin(self, batch, logs=None):
+        _set_learning_rate(self.model, self.lr)
+
+    def on_train_batch_end(self, batch, logs=None):
+        # Bias-corrected exponential moving average of the batch loss
+        self._average = self.smoothing * self._average + (1 - self.smoothing) * logs['loss']
+        loss = self._average / (1 - self.smoothing ** (len(self.losses) + 1))
+        self.lrs.append(self.lr)
+        self.losses.append(loss)
+        self._best = min(self._best, loss)
+        if len(self.losses) >= self.steps or not np.isfinite(loss) or loss > self.divergence * self._best:
+            self.model.stop_training = True
+        self.lr *= self.factor
+
+
+def suggest_learning_rate(lrs, losses, factor=10., skip=0.1):
+    '''Rate of the lowest smoothed loss divided by `factor`
+
+    The first `skip` fraction of the sweep is ignored: its loss is dominated
+    by the noise of a few batches. More robust than the steepest slope,
+    which the same noise often puts at the very bottom of the sweep.
+    '''
+    start = int(len(losses) * skip)
+    return float(lrs[start + int(np.argmin(losses[start:]))] / factor)
+
+
+def lr_range_test(model, X, y, min_lr=1e-7, max_lr=1., steps=200, batch_size=32, smoothing=0.98, divergence=4.):
+    '''Sweep the learning rate of a copy of the compiled `model` over `steps` batches
+
+    Returns the rates, smoothed losses and the suggested rate; `model` itself
+    is left untouched.
+    '''
+    probe = tf.keras.models.clone_model(model)
+    probe.set_weights(model.get_weights())
+    probe.compile(loss=model.loss,
+                  optimizer=model.optimizer.__class__.from_config(model.optimizer.get_config()))
+    sweep = _RangeSweep(min_lr, max_lr, steps, smoothing, divergence)
+    epochs = math.ceil(steps * batch_size / len(X))
+    probe.fit(X, y, batch_size=batch_size, epochs=epochs, callbacks=[sweep], verbose=0)
+    return {'lrs': sweep.lrs, 'losses': sweep.losses,
+            'suggested_lr': suggest_learning_rate(sweep.lrs, sweep.losses)}
+
+
+class OneCycle(Callback):
+    '''Linear warm-up from `max_lr / div_factor` to `max_lr`, then cosine annealing
+
+    The schedule spans `total_steps` batches, by default all the steps of
+    the `fit` call; the rate ends at `max_lr / final_div_factor`.
+    '''
+
+    def __init__(self, max_lr, total_steps=None, warmup_fraction=0.3, div_factor=25., final_div_factor=1e4):
+        super().__init__()
+        self.max_lr = max_lr
+        self.total_steps = total_steps
+        self.warmup_fraction = warmup_fraction
+        self.initial_lr = max_lr / div_factor
+        self.final_lr = max_lr / final_div_factor
+        self.step = 0
+        self.lrs = []
+
+    def on_train_begin(self, logs=None):
+        if self.total_steps is None:
+            self.total_steps = self.params['steps'] * self.params['epochs']
+
+    def learning_rate(self, step):
+        warmup = int(self.warmup_fraction * self.total_steps)
+        if step < warmup:
+            return self.initial_lr + (self.max_lr - self.initial_lr) * step / warmup
+        progress = min(1., (step - warmup) / max(1, self.total_steps - warmup))
+        return self.final_lr + (self.max_lr - self.final_lr) * (1 + math.cos(math.pi * progress)) / 2
+
+    def on_train_batch_begin(self, batch, logs=None):
+        lr = self.learning_rate(self.step)
+        _set_learning_rate(self.model, lr)
+        self.lrs.append(lr)
+        self.step += 1
+
+
+class TimeToTarget(Callback):
+    '''Stop once `monitor` reaches `target`; records the epochs, wall and CPU time spent'''
+
+    def __init__(self, target, monitor='val_accuracy'):
+        super().__init__()
+        self.target = target
+        self.monitor = monitor
+        self.reached_epoch = None
+
+    def on_train_begin(self, logs=None):
+        self._start, self._cpu_start = time.perf_counter(), time.process_time()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epochs = epoch + 1
+        self.seconds = time.perf_counter() - self._start
+        self.cpu_seconds = time.process_time() - self._cpu_start
+        if self.reached_epoch is None and logs.get(self.monitor, -np.inf) >= self.target:
+            self.reached_epoch = epoch + 1
+            self.model.stop_training = True
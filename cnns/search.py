@@ -0,0 +1,256 @@
+'''Grid / random hyper-parameter search over the notebook model builders
+
+Section (6) of the transfer learning notebook suggests a grid search on
+learning_rate, batch_size and data augmentation. `Search` runs one trial
+per parameter combination on a process pool (each worker limited to a few
+threads so trials don't fight for the cores), stops trials whose
+validation curve falls below the median of the finished ones, and stores
+every finished trial in SQLite so an interrupted search resumes where it
+stopped:
+
+    search = Search(build_model, load_data, {
+        'head': ['flatten', 'avg'],
+        'learning_rate': [1e-3, 1e-4],
+        'batch_size': [16, 32],
+        'augmentation': [None, {'horizontal_flip': True, 'rotation_range': 20}],
+    }, store='search.sqlite')
+    search.run(n_jobs=4, threads_per_trial=2)
+    search.best()
+
+With `trial_seed`, every trial starts from `set_seed(trial_seed)`, so
+trials differ only by their parameters.
+
+`build_fn`, `data_fn` and `compile_fn` must be importable top-level
+functions (they are sent to the worker processes). `data_fn()` returns
+`X_train, y_train, X_val, y_val`. Builders that return an uncompiled model
+(`initialize_model`) are compiled by `compile_fn(model, learning_rate=...)`,
+`cnns.cifar.compile_model` by default. Keys of the space are dispatched to:
+
+* the arguments of `build_fn`,
+* `learning_rate`: passed to `compile_fn`, or set on the optimizer of the
+  builders that compile their model (`build_model`, `load_own_model`),
+* `batch_size` and `epochs`: passed to `fit`,
+* `augmentation`: `ImageDataGenerator` arguments (None for no augmentation).
+
+Progress is logged on the `cnns.search` logger. `results()` ranks the
+completed trials only: a pruned trial stopped before its best epoch.
+'''
+
+import inspect
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import numpy as np
+
+from cnns.reproducibility import limit_threads, set_seed
+
+logger = logging.getLogger(__name__)
+
+FIT_KEYS = ('learning_rate', 'batch_size', 'epochs', 'augmentation')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS trials (
+    key TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    value REAL,
+    curve TEXT,
+    duration REAL,
+    error TEXT
+);
+'''
+
+
+def grid(space):
+    '''Every combination of the values of `space`'''
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_samples(space, n, seed=None):
+    '''`n` random combinations; values are lists to pick from or callables `f(rng)`'''
+    rng = random.Random(seed)
+    return [{k: v(rng) if callable(v) else rng.choice(v) for k, v in space.items()} for _ in range(n)]
+
+
+def trial_key(params):
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+class TrialStore:
+    '''Finished trials of a search, shared by the worker processes'''
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=60)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def save(self, params, status, value=None, curve=None, duration=None, error=None):
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO trials VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       (trial_key(params), json.dumps(params, default=str), status, value,
+                        json.dumps(curve or []), duration, error))
+
+    def done_keys(self):
+        '''Keys of the trials that need not run again (failed ones are retried)'''
+        with self._connect() as db:
+            return {key for (key,) in db.execute("SELECT key FROM trials WHERE status != 'failed'")}
+
+    def trials(self):
+        with self._connect() as db:
+            rows = db.execute('SELECT params, status, value, curve, duration, error FROM trials').fetchall()
+        return [{'params': json.loads(params), 'status': status, 'value': value,
+                 'curve': json.loads(curve), 'duration': duration, 'error': error}
+                for params, status, value, curve, duration, error in rows]
+
+    def completed_curves(self):
+        return [t['curve'] for t in self.trials() if t['status'] == 'complete']
+
+
+def _median_pruner(store, monitor='val_accuracy', mode='max', warmup_epochs=3, min_trials=3):
+    '''Keras callback stopping a trial whose best `monitor` so far is worse
+    than the median of the completed trials at the same epoch'''
+    from tensorflow.keras.callbacks import Callback
+
+    better = np.greater if mode == 'max' else np.less
+    best_of = np.maximum.accumulate if mode == 'max' else np.minimum.accumulate
+
+    class MedianPruner(Callback):
+        def __init__(self):
+            super().__init__()
+            self.curve = []
+            self.pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.curve.append(float((logs or {}).get(monitor, np.nan)))
+            if epoch + 1 < warmup_epochs:
+                return
+            references = [best_of(np.array(c))[min(epoch, len(c) - 1)]
+                          for c in store.completed_curves() if c]
+            if len(references) < min_trials:
+                return
+            best = best_of(np.array(self.curve))[-1]
+            if better(np.median(references), best):
+                self.pruned = True
+                self.model.stop_training = True
+
+    return MedianPruner()
+
+
+_DATA = {}
+
+
+def run_trial(build_fn, data_fn, params, store_path, monitor='val_accuracy', mode='max',
+              patience=5, prune=True, seed=None, compile_fn=None):
+    '''Build, train and record one trial; returns the stored trial dict'''
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+    store = TrialStore(store_path)
+    start = time.perf_counter()
+    try:
+        if data_fn not in _DATA:  # once per worker process
+            _DATA[data_fn] = data_fn()
+        X_train, y_train, X_val, y_val = _DATA[data_fn]
+        if seed is not None:
+            set_seed(seed)
+
+        build_params = {k: v for k, v in params.items() if k not in FIT_KEYS}
+        model = build_fn(**build_params)
+        compile_params = {k: params[k] for k in ('learning_rate',) if k in params}
+        if compile_fn is None and model.optimizer is None:
+            from cnns.cifar import compile_model as compile_fn
+        if compile_fn is not None:
+            compile_fn(model, **compile_params)
+        elif compile_params:
+            model.optimizer.learning_rate.assign(compile_params['learning_rate'])
+
+        batch_size = params.get('batch_size', 32)
+        es = EarlyStopping(monitor=monitor, mode=mode, patience=patience, restore_best_weights=True)
+        pruner = _median_pruner(store, monitor, mode) if prune else None
+        callbacks = [es] + ([pruner] if pruner else [])
+        if params.get('augmentation'):
+            datagen = ImageDataGenerator(**params['augmentation'])
+            history = model.fit(datagen.flow(X_train, y_train, batch_size=batch_size),
+                                validation_data=(X_val, y_val),
+                                epochs=params.get('epochs', 50), callbacks=callbacks, verbose=0)
+        else:
+            history = model.fit(X_train, y_train, validation_data=(X_val, y_val),
+                                batch_size=batch_size,
+                                epochs=params.get('epochs', 50), callbacks=callbacks, verbose=0)
+
+        curve = [float(v) for v in history.history[monitor]]
+        value = max(curve) if mode == 'max' else min(curve)
+        status = 'pruned' if pruner is not None and pruner.pruned else 'complete'
+        store.save(params, status, value, curve, time.perf_counter() - start)
+    except Exception as e:
+        store.save(params, 'failed', duration=time.perf_counter() - start, error=repr(e))
+    return next(t for t in store.trials() if trial_key(t['params']) == trial_key(params))
+
+
+class Search:
+    def __init__(self, build_fn, data_fn, space, store='search.sqlite', monitor='val_accuracy',
+                 mode='max', patience=5, prune=True, trial_seed=None, compile_fn=None):
+        unknown = set(space) - set(FIT_KEYS) - set(inspect.signature(build_fn).parameters)
+        if unknown and not any(p.kind == p.VAR_KEYWORD for p in inspect.signature(build_fn).parameters.values()):
+            raise ValueError(f'{build_fn.__name__} has no parameter {sorted(unknown)}')
+        self.build_fn = build_fn
+        self.data_fn = data_fn
+        self.space = space
+        self.store = TrialStore(store)
+        self.monitor = monitor
+        self.mode = mode
+        self.patience = patience
+        self.prune = prune
+        self.trial_seed = trial_seed
+        self.compile_fn = compile_fn
+
+    def run(self, n_jobs=1, threads_per_trial=None, n_trials=None, seed=None):
+        '''Run the missing trials: the whole grid, or `n_trials` random ones'''
+        candidates = grid(self.space) if n_trials is None else random_samples(self.space, n_trials, seed)
+        done = self.store.done_keys()
+        todo = [params for params in candidates if trial_key(params) not in done]
+        threads = threads_per_trial or max(1, (os.cpu_count() or 1) // n_jobs)
+
+        # spawn: TensorFlow is not fork-safe once initialised in the parent
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(n_jobs, mp_context=context, initializer=limit_threads,
+                                 initargs=(threads,)) as pool:
+            futures = [pool.submit(run_trial, self.build_fn, self.data_fn, params, self.store.path,
+                                   self.monitor, self.mode, self.patience, self.prune, self.trial_seed,
+                                   self.compile_fn)
+                       for params in todo]
+            for future in as_completed(futures):
+                trial = future.result()
+                if trial['status'] == 'failed':
+                    logger.warning('[failed] %s: %s', trial['params'], trial['error'])
+                else:
+                    logger.info('[%s] %s=%s %s', trial['status'], self.monitor, trial['value'], trial['params'])
+        return self.results()
+
+    def results(self, include_pruned=False):
+        '''Completed trials (and the pruned ones with `include_pruned`), best first'''
+        statuses = ('complete', 'pruned') if include_pruned else ('complete',)
+        trials = [t for t in self.store.trials() if t['status'] in statuses]
+        return sorted(trials, key=lambda t: t['value'], reverse=self.mode == 'max')
+
+    def best(self):
+        results = self.results()
+        return results[0] if results else None
@@ -0,0 +1,231 @@
+'''Micro-batching HTTP inference server for the flowers classifier
+
+Requests arrive one image at a time. Instead of one `predict` per request,
+`MicroBatcher` queues the images and runs a single batched prediction on a
+worker thread once `max_batch_size` images are waiting or the oldest one
+has waited `max_latency_ms`, then hands each caller its own row.
+
+    python -m cnns.serving vgg16_weights.h5 --port 8080
+
+    curl --data-binary @flowers/rose/xxx.jpg localhost:8080/predict
+    curl localhost:8080/metrics
+'''
+
+import argparse
+import asyncio
+import io
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+
+class MicroBatcher:
+    '''Group single-image requests into batches for `predict_fn`
+
+    `predict_fn` takes a (n, ...) array and returns n predictions; it runs
+    on a dedicated thread so the event loop keeps accepting requests.
+    '''
+
+    def __init__(self, predict_fn, max_batch_size=32, max_latency_ms=5., metrics_window=10000):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.latencies = deque(maxlen=metrics_window)
+        self.batch_sizes = deque(maxlen=metrics_window)
+        self.num_requests = 0
+        self._queue = None
+        self._worker = None
+        self._batch = []  # taken from the queue, not answered yet
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        '''Stop the worker; the requests still waiting fail with a RuntimeError'''
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._executor.shutdown()
+        pending = self._batch
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError('MicroBatcher stopped'))
+        self._batch = []
+
+    async def predict(self, image):
+        '''Prediction for a single image, batched with the concurrent ones'''
+        if self._worker is None or self._worker.done():
+            raise RuntimeError('MicroBatcher is not running')
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self):
+        batch = self._batch = [await self._queue.get()]
+        deadline = batch[0][2] + self.max_latency
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                # Under load the deadline is often already past: still take what is waiting
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            images, futures, starts = zip(*batch)
+            try:
+                predictions = await loop.run_in_executor(self._executor, self.predict_fn, np.stack(images))
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                self._batch = []
+                continue
+            self._batch = []
+            end = time.perf_counter()
+            for future, prediction, start in zip(futures, predictions, starts):
+                if not future.done():
+                    future.set_result(prediction)
+                self.latencies.append(end - start)
+            self.batch_sizes.append(len(batch))
+            self.num_requests += len(batch)
+
+    def metrics(self):
+        '''Latency percentiles (ms) and batch fill over the last requests'''
+        latencies = np.array(self.latencies) * 1000
+        sizes = np.array(self.batch_sizes)
+        return {
+            'requests': self.num_requests,
+            'batches': len(sizes),
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'mean_batch_size': float(sizes.mean()) if len(sizes) else None,
+            'batch_fill': float(sizes.mean() / self.max_batch_size) if len(sizes) else None,
+        }
+
+
+class InferenceServer:
+    '''Minimal HTTP/1.1 front-end for a `MicroBatcher`
+
+    POST /predict with an encoded image (JPEG, PNG...) as body returns the
+    class probabilities; GET /metrics returns `MicroBatcher.metrics()`.
+    '''
+
+    def __init__(self, batcher, image_size=(256, 256), class_names=None):
+        self.batcher = batcher
+        self.image_size = image_size
+        self.class_names = class_names
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        await self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await self.batcher.stop()
+
+    def decode(self, body):
+        image = Image.open(io.BytesIO(body)).convert('RGB').resize(self.image_size)
+        return np.asarray(image, dtype='float32')
+
+    async def _respond(self, method, path, body):
+        if method == 'GET' and path == '/metrics':
+            return 200, self.batcher.metrics()
+        if method == 'POST' and path == '/predict':
+            try:
+                image = self.decode(body)
+            except Exception as e:
+                return 400, {'error': f'Cannot decode image: {e}'}
+            try:
+                probabilities = await self.batcher.predict(image)
+            except Exception as e:
+                return 500, {'error': f'Prediction failed: {e}'}
+            result = {'probabilities': [float(p) for p in probabilities]}
+            if self.class_names is not None:
+                result['class'] = self.class_names[int(np.argmax(probabilities))]
+            return 200, result
+        return 404, {'error': f'No route for {method} {path}'}
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self._respond(method, path, body)
+                data = json.dumps(payload).encode()
+                writer.write(f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                             f'Content-Type: application/json\r\n'
+                             f'Content-Length: {len(data)}\r\n\r\n'.encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('weights', help='weights of the build_model classifier')
+    parser.add_argument('--backbone', default='vgg16')
+    parser.add_argument('--head', default='flatten')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-latency-ms', type=float, default=5.)
+    parser.add_argument('--tta-views', type=int, default=1, help='average over this many flip/shift views')
+    args = parser.parse_args()
+
+    from cnns.export import with_preprocessing
+    from cnns.transfer import CLASSES, IMAGE_SHAPE, build_model
+
+    # The trained weights replace the whole model: no ImageNet download at startup
+    model = build_model(args.head, backbone=args.backbone, weights=None)
+    model.load_weights(args.weights)
+    served = with_preprocessing(model, args.backbone)
+    from cnns.tta import tta_predict
+    batcher = MicroBatcher(lambda X: tta_predict(served, X, args.tta_views, batch_size=len(X)),
+                           args.max_batch_size, args.max_latency_ms)
+    server = InferenceServer(batcher, IMAGE_SHAPE[:2], class_names=list(CLASSES))
+
+    async def serve():
+        host, port = await server.start(args.host, args.port)
+        print(f'Serving on http://{host}:{port}')
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+'''Wall-clock timing shared by the library and the benchmarks'''
+
+import time
+
+
+def time_call(fn, repeats=20, warmup=2):
+    '''Median wall time of `fn()` in seconds'''
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2]
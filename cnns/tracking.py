@@ -0,0 +1,195 @@
+'''Local experiment tracker for Keras `fit` calls
+
+Every run gets a row in a SQLite database, and every epoch its metrics
+(the `history.history` keys) plus wall time, images/sec and memory usage,
+so that runs can be compared after the notebook is gone:
+
+    tracker = Tracker('runs.sqlite')
+    model.fit(..., callbacks=[tracker.callback('vgg16_aug', batch_size=16, config={'lr': 1e-4})])
+
+    tracker.runs()                     # one dict per run
+    tracker.history(run_id)            # same layout as `history.history`
+    tracker.compare('images_per_sec')  # last value of a metric for each run
+'''
+
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+from tensorflow.keras.callbacks import Callback
+
+from cnns.reproducibility import run_metadata
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    config TEXT,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    epoch INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, epoch, name)
+);
+'''
+
+
+def current_rss_mb():
+    '''Resident set size of the process in MB, from /proc (None elsewhere)'''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    '''Peak resident set size of the process so far, in MB (None on Windows)'''
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS, in KiB on Linux and the BSDs
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+class Tracker:
+    '''Store of runs and per-epoch metrics in a SQLite file'''
+
+    def __init__(self, path='runs.sqlite'):
+        self.path = path
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def start_run(self, name, config=None):
+        with self._connect() as db:
+            cursor = db.execute('INSERT INTO runs (name, started_at, config) VALUES (?, ?, ?)',
+                                (name, time.time(), json.dumps(config or {}, default=str)))
+            return cursor.lastrowid
+
+    def log_epoch(self, run_id, epoch, metrics):
+        with self._connect() as db:
+            db.executemany('INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?)',
+                           [(run_id, epoch, name, None if value is None else float(value))
+                            for name, value in metrics.items()])
+
+    def end_run(self, run_id, summary=None):
+        with self._connect() as db:
+            db.execute('UPDATE runs SET ended_at = ?, summary = ? WHERE run_id = ?',
+                       (time.time(), json.dumps(summary or {}, default=str), run_id))
+
+    def update_config(self, run_id, **config):
+        '''Merge `config` into the stored configuration of `run_id`'''
+        with self._connect() as db:
+            (stored,) = db.execute('SELECT config FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+            db.execute('UPDATE runs SET config = ? WHERE run_id = ?',
+                       (json.dumps({**json.loads(stored or '{}'), **config}, default=str), run_id))
+
+    def callback(self, name, batch_size=None, samples=None, config=None):
+        return TrackingCallback(self, name, batch_size, samples, config)
+
+    def runs(self, name=None):
+        '''All runs (optionally those called `name`), oldest first'''
+        query = 'SELECT run_id, name, started_at, ended_at, config, summary FROM runs'
+        params = ()
+        if name is not None:
+            query += ' WHERE name = ?'
+            params = (name,)
+        with self._connect() as db:
+            rows = db.execute(query + ' ORDER BY run_id', params).fetchall()
+        return [{
+            'run_id': run_id, 'name': run_name, 'started_at': started_at, 'ended_at': ended_at,
+            'config': json.loads(config or '{}'), 'summary': json.loads(summary or '{}'),
+        } for run_id, run_name, started_at, ended_at, config, summary in rows]
+
+    def history(self, run_id):
+        '''Metrics of `run_id` as `{name: [value per epoch]}`, like `history.history`
+
+        Every list has one entry per logged epoch, None where the metric was
+        not logged (e.g. validation metrics computed every few epochs).
+        '''
+        with self._connect() as db:
+            rows = db.execute('SELECT epoch, name, value FROM metrics WHERE run_id = ? ORDER BY epoch',
+                              (run_id,)).fetchall()
+        epochs = sorted({epoch for epoch, _, _ in rows})
+        by_name = {}
+        for epoch, name, value in rows:
+            by_name.setdefault(name, {})[epoch] = value
+        return {name: [values.get(epoch) for epoch in epochs] for name, values in by_name.items()}
+
+    def compare(self, metric, run_ids=None, reduce=None):
+        '''`{run_id: value}` of `metric` reduced over epochs (last epoch by default)'''
+        reduce = reduce or (lambda values: values[-1])
+        run_ids = run_ids or [run['run_id'] for run in self.runs()]
+        result = {}
+        for run_id in run_ids:
+            values = [v for v in self.history(run_id).get(metric, []) if v is not None]
+            if values:
+                result[run_id] = reduce(values)
+        return result
+
+
+class TrackingCallback(Callback):
+    '''Log every epoch of a `fit` call into a `Tracker`
+
+    Images/sec needs the number of training samples: give `samples`, or
+    `batch_size` to estimate it from the number of steps.
+    '''
+
+    def __init__(self, tracker, name, batch_size=None, samples=None, config=None):
+        super().__init__()
+        self.tracker = tracker
+        self.name = name
+        self.batch_size = batch_size
+        self.samples = samples
+        self.config = config or {}
+        self.run_id = None
+
+    def on_train_begin(self, logs=None):
+        config = dict(self.config, batch_size=self.batch_size, epochs=self.params.get('epochs'),
+                      steps=self.params.get('steps'), **run_metadata())
+        if self.model is not None:
+            config['params'] = self.model.count_params()
+        self.run_id = self.tracker.start_run(self.name, config)
+        self._train_start = time.perf_counter()
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        epoch_time = time.perf_counter() - self._epoch_start
+        samples = self.samples
+        if samples is None and self.batch_size and self.params.get('steps'):
+            samples = self.params['steps'] * self.batch_size
+        metrics = dict(logs or {})
+        metrics.update({
+            'epoch_time': epoch_time,
+            'images_per_sec': samples / epoch_time if samples else None,
+            'rss_mb': current_rss_mb(),
+            'peak_rss_mb': peak_rss_mb(),
+        })
+        self.tracker.log_epoch(self.run_id, epoch, metrics)
+
+    def on_train_end(self, logs=None):
+        self.tracker.end_run(self.run_id, {
+            'train_time': time.perf_counter() - self._train_start,
+            'peak_rss_mb': peak_rss_mb(),
+            'final': logs or {},
+        })
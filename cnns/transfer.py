@@ -0,0 +1,111 @@
+'''Flowers data and models from the transfer learning notebook'''
+
+from tensorflow.keras import Sequential, layers, models, optimizers
+from tensorflow.keras.layers.experimental.preprocessing import Rescaling
+from tensorflow.keras.utils import to_categorical
+
+from cnns.backbones import load_backbone
+from cnns.data import ImageFolder, ImageSequence, split_indices
+from cnns.datasets import load_flowers
+from cnns.heads import get_head
+
+CLASSES = {'daisy': 0, 'dandelion': 1, 'rose': 2}
+IMAGE_SHAPE = (256, 256, 3)
+
+
+def load_flowers_data(data_path='flowers/', max_per_class=300):
+    '''Load the flowers images in memory and return a shuffled train/val/test split
+
+    Everything is held as uint8 arrays, hence the `max_per_class` cap: use
+    `flowers_sequences` to train on the whole corpus with constant memory.
+    '''
+    folder = ImageFolder(data_path, CLASSES, IMAGE_SHAPE[:2], max_per_class=max_per_class)
+    y = to_categorical(folder.labels, folder.num_classes)
+
+    # Shuffling and splitting on indices: each split is decoded once, no copy of the whole set
+    train, val, test = split_indices(len(folder))
+    X_train, X_val, X_test = (folder.load(idx) for idx in (train, val, test))
+    y_train, y_val, y_test = y[train], y[val], y[test]
+
+    return X_train, y_train, X_val, y_val, X_test, y_test, folder.num_classes
+
+
+def flowers_sequences(data_path='flowers/', batch_size=16, preprocess=None, max_per_class=None):
+    '''Train/val/test `ImageSequence`s over the whole flowers directory'''
+    folder = ImageFolder(data_path, CLASSES, IMAGE_SHAPE[:2], max_per_class=max_per_class)
+    train, val, test = split_indices(len(folder))
+    return (ImageSequence(folder, train, batch_size, preprocess),
+            ImageSequence(folder, val, batch_size, preprocess, shuffle=False),
+            ImageSequence(folder, test, batch_size, preprocess, shuffle=False))
+
+
+def load_flowers_mirror(mirror=None):
+    '''Same split as `load_flowers_data`, from the offline mirror of `cnns.datasets`'''
+    X, labels = load_flowers(mirror)
+    y = to_categorical(labels, len(CLASSES))
+    train, val, test = split_indices(len(X))
+    return X[train], y[train], X[val], y[val], X[test], y[test], len(CLASSES)
+
+
+def load_own_model(input_shape=IMAGE_SHAPE, num_classes=3):
+    '''Homemade CNN with the rescaling piped into the architecture'''
+    model = Sequential()
+    model.add(Rescaling(1./255, input_shape=input_shape))
+
+    model.add(layers.Conv2D(16, kernel_size=10, activation='relu'))
+    model.add(layers.MaxPooling2D(3))
+
+    model.add(layers.Conv2D(32, kernel_size=8, activation="relu"))
+    model.add(layers.MaxPooling2D(3))
+
+    model.add(layers.Conv2D(32, kernel_size=6, activation="relu"))
+    model.add(layers.MaxPooling2D(3))
+
+    model.add(layers.Flatten())
+    model.add(layers.Dense(100, activation='relu'))
+    model.add(layers.Dense(num_classes, activation='softmax'))
+
+    opt = optimizers.Adam(learning_rate=1e-4)
+    model.compile(loss='categorical_crossentropy',
+                  optimizer=opt,
+                  metrics=['accuracy'])
+
+    return model
+
+
+def load_model(input_shape=IMAGE_SHAPE, backbone='vgg16', weights='imagenet', weights_dir=None):
+    '''Pretrained backbone (VGG16 by default) without its fully-connected top
+
+    See `cnns.backbones` for the available backbones and offline weights.
+    '''
+    return load_backbone(backbone, input_shape, weights, weights_dir)
+
+
+def set_nontrainable_layers(model):
+    model.trainable = False
+    return model
+
+
+def add_last_layers(model, head='flatten', num_classes=3, **head_kwargs):
+    '''Take a pre-trained model, set its parameters as non-trainable, and add additional trainable layers on top
+
+    `head` selects one of the builders of `cnns.heads` (flatten, avg, max, low_rank).
+    '''
+    base_model = set_nontrainable_layers(model)
+    return models.Sequential([base_model] + get_head(head, num_classes, **head_kwargs))
+
+
+def build_model(head='flatten', input_shape=IMAGE_SHAPE, num_classes=3, backbone='vgg16',
+                weights='imagenet', weights_dir=None, **head_kwargs):
+    '''Frozen `backbone` + `head`, compiled with Adam(1e-4)
+
+    The inputs must be prepared with `cnns.backbones.get_preprocess_input(backbone)`.
+    '''
+    model = load_model(input_shape, backbone, weights, weights_dir)
+    model = add_last_layers(model, head, num_classes, **head_kwargs)
+
+    opt = optimizers.Adam(learning_rate=1e-4)
+    model.compile(loss='categorical_crossentropy',
+                  optimizer=opt,
+                  metrics=['accuracy'])
+    return model
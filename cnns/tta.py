@@ -0,0 +1,58 @@
+'''Test-time augmentation: average the predictions over flipped/shifted views
+
+All the views of a batch of images are built with array slicing (no
+per-image loop) and stacked into one enlarged batch, so the model runs a
+single forward pass per batch:
+
+    probabilities = tta_predict(model, X_test, num_views=4)
+    accuracy = tta_evaluate(model, X_test, y_test, num_views=4)
+
+The views are, in order: the image, its horizontal flip, then the image
+and its flip shifted right, left, down and up by `shift` pixels (edges
+replicated). `num_views=1` is the plain prediction.
+'''
+
+import numpy as np
+
+SHIFTS = ((0, 0), (0, 1), (0, -1), (1, 0), (-1, 0))
+MAX_VIEWS = 2 * len(SHIFTS)
+
+
+def _offsets(num_views):
+    '''(flip, dy, dx) of the first `num_views` views'''
+    if not 1 <= num_views <= MAX_VIEWS:
+        raise ValueError(f'num_views must be between 1 and {MAX_VIEWS}, got {num_views}')
+    return [(flip, dy, dx) for dy, dx in SHIFTS for flip in (False, True)][:num_views]
+
+
+def tta_views(X, num_views=4, shift=None):
+    '''Views of the images `X` (N, H, W, C) as one (num_views * N, H, W, C) batch, view-major'''
+    X = np.asarray(X)
+    height, width = X.shape[1:3]
+    shift = shift or max(1, width // 16)
+    offsets = _offsets(num_views)
+    if any(dy or dx for _, dy, dx in offsets):
+        padded = np.pad(X, ((0, 0), (shift, shift), (shift, shift), (0, 0)), mode='edge')
+    views = []
+    for flip, dy, dx in offsets:
+        view = X if not (dy or dx) else padded[:, shift - dy * shift:shift - dy * shift + height,
+                                               shift - dx * shift:shift - dx * shift + width]
+        views.append(view[:, :, ::-1] if flip else view)
+    return np.concatenate(views)
+
+
+def tta_predict(model, X, num_views=4, batch_size=32, shift=None):
+    '''Class probabilities of `model` averaged over `num_views` views of each image'''
+    predictions = []
+    for i in range(0, len(X), batch_size):
+        batch = np.asarray(X[i:i + batch_size], dtype='float32')
+        views = tta_views(batch, num_views, shift)
+        probabilities = np.asarray(model(views, training=False))
+        predictions.append(probabilities.reshape(num_views, len(batch), -1).mean(axis=0))
+    return np.concatenate(predictions)
+
+
+def tta_evaluate(model, X, y, num_views=4, batch_size=32, shift=None):
+    '''Accuracy of the averaged predictions against the one-hot labels `y`'''
+    predictions = tta_predict(model, X, num_views, batch_size, shift)
+    return float(np.mean(predictions.argmax(-1) == np.asarray(y).argmax(-1)))